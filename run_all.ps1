@@ -20,8 +20,9 @@ Write-Host "Step 4: Syncing to HDFS..."
 docker run --rm --network finalbigdataproject_default `
   -v "${PWD}/scripts:/app" `
   -w /app `
+  -e MINIO_ENDPOINT=minio:9000 `
   python:3.9-slim `
-  /bin/bash -c "pip install minio hdfs && python ./scripts/hdfs_sync.py"
+  /bin/bash -c "pip install minio hdfs && python hdfs_sync.py"
 
 # 5. Merging
 Write-Host "Step 5: Merging Datasets..."
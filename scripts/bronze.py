@@ -1,21 +1,18 @@
-from io import BytesIO
-import pandas as pd
-from numpy import random
-from minio import Minio
+import minio_config
+import transfer
 
 
 def upload_to_bronze():
-    client = Minio("localhost:9000", "admin", "admin123", secure=False)
+    client = minio_config.get_client()
 
-    client.fput_object(
+    # Both files upload at once, each as parallel multipart parts
+    transfer.upload_files(
+        client,
         "bronze",
-        "weather_data.csv",
-        "D:\\Data Engineer\\Data Engineering Projects\\Final Big Data Project\\SyntheticData\\weather_data.csv",
-    )
-    client.fput_object(
-        "bronze",
-        "traffic_data.csv",
-        "D:\\Data Engineer\\Data Engineering Projects\\Final Big Data Project\\SyntheticData\\traffic_data.csv",
+        {
+            "weather_data.csv": "D:\\Data Engineer\\Data Engineering Projects\\Final Big Data Project\\SyntheticData\\weather_data.csv",
+            "traffic_data.csv": "D:\\Data Engineer\\Data Engineering Projects\\Final Big Data Project\\SyntheticData\\traffic_data.csv",
+        },
     )
 
     list_of_objs = client.list_objects("bronze")
@@ -25,4 +22,5 @@ def upload_to_bronze():
     return objects
 
 
-print(upload_to_bronze())
+if __name__ == "__main__":
+    print(upload_to_bronze())
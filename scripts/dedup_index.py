@@ -0,0 +1,171 @@
+import os
+import tempfile
+from datetime import datetime, timezone
+from io import BytesIO
+import numpy as np
+import pandas as pd
+import transfer
+
+# Persistent set of 64-bit row fingerprints used to drop rows that were
+# already ingested. Fingerprints live in immutable sorted segments
+# (<prefix>/segment-*.npy) plus one Bloom filter (<prefix>/bloom.npy) in
+# MinIO. Segments are cached on local disk and memory-mapped, so lookups only
+# touch the pages they need. Without a client the index is in-memory only.
+
+BLOOM_BITS = 1 << 27  # 16 MiB, ~1% false positives at 14M fingerprints
+BLOOM_HASHES = 7
+# Segments are merged into one when a commit would leave more than this
+MAX_SEGMENTS = 16
+CACHE_DIR = os.path.join(tempfile.gettempdir(), "dedup_index_cache")
+
+
+def row_fingerprints(df):
+    return pd.util.hash_pandas_object(df, index=False).to_numpy(dtype=np.uint64)
+
+
+class FingerprintIndex:
+    def __init__(self, client=None, bucket="silver", prefix=None):
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+        self.segments = []  # committed, sorted and unique
+        self.segment_objects = []  # object names behind self.segments
+        self.pending = []  # added during this run, sorted and unique
+        self.bloom = np.zeros(BLOOM_BITS // 8, dtype=np.uint8)
+        if client is not None:
+            self.load()
+
+    def bloom_positions(self, fingerprints):
+        # Double hashing: position_i = h1 + i * h2 (mod BLOOM_BITS)
+        h1 = fingerprints & np.uint64(0xFFFFFFFF)
+        h2 = (fingerprints >> np.uint64(32)) | np.uint64(1)
+        steps = np.arange(BLOOM_HASHES, dtype=np.uint64)
+        return (h1[:, None] + steps * h2[:, None]) % np.uint64(BLOOM_BITS)
+
+    def add_to_bloom(self, fingerprints):
+        positions = self.bloom_positions(fingerprints).ravel()
+        np.bitwise_or.at(
+            self.bloom,
+            positions >> np.uint64(3),
+            (np.uint8(1) << (positions & np.uint64(7)).astype(np.uint8)),
+        )
+
+    def contains(self, fingerprints):
+        fingerprints = np.asarray(fingerprints, dtype=np.uint64)
+        positions = self.bloom_positions(fingerprints)
+        bits = self.bloom[positions >> np.uint64(3)] >> (
+            positions & np.uint64(7)
+        ).astype(np.uint8)
+        maybe = (bits & 1).all(axis=1)
+
+        # Only Bloom hits are checked against the exact segments
+        candidates = fingerprints[maybe]
+        found = np.zeros(len(candidates), dtype=bool)
+        for segment in self.segments + self.pending:
+            if len(segment) == 0 or len(candidates) == 0:
+                continue
+            idx = np.minimum(np.searchsorted(segment, candidates), len(segment) - 1)
+            found |= segment[idx] == candidates
+
+        result = np.zeros(len(fingerprints), dtype=bool)
+        result[maybe] = found
+        return result
+
+    def add(self, fingerprints):
+        fingerprints = np.unique(np.asarray(fingerprints, dtype=np.uint64))
+        if len(fingerprints):
+            self.pending.append(fingerprints)
+            self.add_to_bloom(fingerprints)
+
+    def drop_seen(self, df):
+        # Keeps the first occurrence of every row not already in the index and
+        # records it, so later chunks (and later runs, once committed) skip it.
+        fingerprints = row_fingerprints(df)
+        new_rows = ~pd.Series(fingerprints).duplicated().to_numpy()
+        new_rows &= ~self.contains(fingerprints)
+        self.add(fingerprints[new_rows])
+        return df[new_rows]
+
+    # --- Persistence ---
+
+    def segment_names(self):
+        return sorted(
+            obj.object_name
+            for obj in self.client.list_objects(
+                self.bucket, prefix=f"{self.prefix}/segment-", recursive=True
+            )
+        )
+
+    def load_segment(self, object_name):
+        # Segments never change once written, so the object name is a safe
+        # cache key.
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        local_path = os.path.join(CACHE_DIR, object_name.replace("/", "__"))
+        if not os.path.exists(local_path):
+            transfer.download_file(self.client, self.bucket, object_name, local_path)
+        return np.load(local_path, mmap_mode="r")
+
+    def load(self):
+        self.segment_objects = self.segment_names()
+        self.segments = [self.load_segment(name) for name in self.segment_objects]
+
+        try:
+            response = self.client.get_object(self.bucket, f"{self.prefix}/bloom.npy")
+            bloom = np.load(BytesIO(response.read()))
+            response.close()
+            response.release_conn()
+        except Exception:
+            bloom = None
+
+        if bloom is not None and len(bloom) == len(self.bloom):
+            self.bloom = bloom
+        else:
+            # Missing or resized filter: rebuild it from the exact segments
+            for segment in self.segments:
+                self.add_to_bloom(np.asarray(segment))
+
+    def put_array(self, object_name, array):
+        buffer = BytesIO()
+        np.save(buffer, array)
+        buffer.seek(0)
+        self.client.put_object(
+            self.bucket,
+            object_name,
+            buffer,
+            buffer.getbuffer().nbytes,
+            content_type="application/octet-stream",
+        )
+
+    def commit(self):
+        # Call only after the rows behind the pending fingerprints are safely
+        # stored, otherwise a failed run would hide them from the next one.
+        if self.client is None or not self.pending:
+            return
+
+        existing = self.segment_names()
+        new_segment = np.unique(np.concatenate(self.pending))
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+
+        # Segments committed by other writers since load() are not in this
+        # index's Bloom filter yet, and the upload below replaces theirs
+        for name in existing:
+            if name not in self.segment_objects:
+                self.add_to_bloom(np.asarray(self.load_segment(name)))
+
+        if len(existing) + 1 > MAX_SEGMENTS:
+            # Merge exactly the segments that are deleted afterwards
+            merged = np.unique(
+                np.concatenate(
+                    [np.asarray(self.load_segment(name)) for name in existing]
+                    + [new_segment]
+                )
+            )
+            self.put_array(f"{self.prefix}/segment-{stamp}.npy", merged)
+            for name in existing:
+                self.client.remove_object(self.bucket, name)
+        else:
+            self.put_array(f"{self.prefix}/segment-{stamp}.npy", new_segment)
+
+        self.put_array(f"{self.prefix}/bloom.npy", self.bloom)
+        self.pending = []
+        self.load()
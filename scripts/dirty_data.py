@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+
+# Dirty-data injection shared by the generators. A spec declares how messy
+# the output should be; corrupt() applies it to a chunk of clean column
+# arrays in one pass, with masks over the arrays instead of DataFrame writes,
+# so the same dirt level costs the same per row at any scale. Every key is
+# optional and an empty spec writes clean data:
+#
+#   duplicate_rate       share of rows appended again as exact duplicates
+#   null_rate            null share for every column...
+#   null_rates           ...or per column ({column: rate}, overrides null_rate)
+#   outliers             {column: (rate, draw, arguments)}; values are drawn
+#                        with rng.<draw>(*arguments, size), or picked from
+#                        arguments when draw is "choice"
+#   bad_timestamp_rate   share of timestamps replaced by one of
+#   bad_timestamps       these malformed strings
+#   timestamp_column     column holding the datetime64 timestamps
+#
+# Duplicates copy the clean row, then outliers, nulls and malformed
+# timestamps are drawn independently per row of the result.
+
+DEFAULT_SPEC = {
+    "duplicate_rate": 0.0,
+    "null_rate": 0.0,
+    "null_rates": {},
+    "outliers": {},
+    "bad_timestamp_rate": 0.0,
+    "bad_timestamps": ["2099-13-40 25:61"],
+    "timestamp_column": "date_time",
+}
+
+
+def draw_values(rng, draw, arguments, size):
+    if draw == "choice":
+        return rng.choice(arguments, size)
+    return getattr(rng, draw)(*arguments, size)
+
+
+def format_timestamps(values):
+    # "YYYY-MM-DD HH:MM:SS", as DataFrame.to_csv writes datetimes
+    text = np.char.replace(np.datetime_as_string(values, unit="s"), "T", " ")
+    return text.astype(object)
+
+
+def corrupt(columns, categories, spec, rng):
+    # columns: {name: array} of clean rows; columns in categories hold codes
+    # into categories[name]. Returns the messy rows as a DataFrame.
+    spec = {**DEFAULT_SPEC, **spec}
+    n = len(next(iter(columns.values())))
+    rows = np.arange(n)
+    if spec["duplicate_rate"]:
+        duplicates = rng.choice(n, int(n * spec["duplicate_rate"]), replace=False)
+        rows = np.concatenate([rows, duplicates])
+    size = len(rows)
+
+    data = {}
+    for name, values in columns.items():
+        values = np.asarray(values)[rows]
+        null_rate = spec["null_rates"].get(name, spec["null_rate"])
+        nulls = rng.random(size) < null_rate if null_rate else None
+
+        if name in categories:
+            if nulls is not None:
+                values = np.where(nulls, -1, values)
+            data[name] = pd.Categorical.from_codes(values, categories[name])
+            continue
+
+        if name == spec["timestamp_column"]:
+            values = format_timestamps(values)
+            if spec["bad_timestamp_rate"]:
+                bad = rng.random(size) < spec["bad_timestamp_rate"]
+                values[bad] = rng.choice(spec["bad_timestamps"], bad.sum())
+        elif name in spec["outliers"]:
+            rate, draw, arguments = spec["outliers"][name]
+            hits = rng.random(size) < rate
+            outliers = draw_values(rng, draw, arguments, hits.sum())
+            values = values.astype(np.result_type(values, outliers))
+            values[hits] = outliers
+
+        if nulls is not None and nulls.any():
+            if values.dtype.kind in "biuf":
+                values = values.astype(np.float64)
+                values[nulls] = np.nan
+            else:
+                values = values.astype(object)
+                values[nulls] = None
+        data[name] = values
+    return pd.DataFrame(data)
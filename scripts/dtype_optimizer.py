@@ -0,0 +1,131 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+# Shared dtype compaction applied to DataFrames before they are written as
+# Parquet. Every downcast is range checked, so values never change beyond
+# float32 rounding.
+
+# Strings become categoricals when at most this many distinct values and
+# this share of the rows are distinct
+CATEGORY_MAX_UNIQUE = 1000
+CATEGORY_MAX_RATIO = 0.5
+# Whole numbers above this lose precision in float32
+FLOAT32_EXACT_INT = 2**24
+FLOAT32_MAX = float(np.finfo(np.float32).max)
+
+
+def downcast_column(series):
+    if pd.api.types.is_bool_dtype(series):
+        return series
+    if pd.api.types.is_integer_dtype(series):
+        # Smallest integer type holding min..max
+        return pd.to_numeric(series, downcast="integer")
+
+    if pd.api.types.is_float_dtype(series):
+        values = series.dropna().to_numpy()
+        if len(values) == 0 or not np.isfinite(values).all():
+            return series
+        largest = np.abs(values).max()
+        whole = (values == np.round(values)).all()
+        if largest <= FLOAT32_MAX and not (whole and largest > FLOAT32_EXACT_INT):
+            return series.astype(np.float32)
+        return series
+
+    if pd.api.types.is_datetime64_any_dtype(series):
+        if getattr(series.dt, "tz", None) is not None:
+            return series
+        values = series.dropna()
+        if (values == values.dt.floor("s")).all():
+            return series.astype("datetime64[s]")
+        return series
+
+    if pd.api.types.is_string_dtype(series) and len(series):
+        unique = series.nunique(dropna=True)
+        if unique <= CATEGORY_MAX_UNIQUE and unique <= CATEGORY_MAX_RATIO * len(series):
+            return series.astype("category")
+    return series
+
+
+def checked_astype(series, dtype):
+    # astype, raising ValueError instead of letting integers wrap around,
+    # fractions be truncated or finite floats overflow to inf
+    if not isinstance(dtype, np.dtype) or dtype.kind not in "iuf":
+        return series.astype(dtype)
+    if not pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series):
+        return series.astype(dtype)
+    values = series.dropna().to_numpy()
+    if dtype.kind in "iu":
+        if len(values) < len(series):
+            raise ValueError(f"{series.name}: nulls can't be stored as {dtype}")
+        if values.dtype.kind == "f" and not (values == np.round(values)).all():
+            raise ValueError(
+                f"{series.name}: non-integer values can't be stored as {dtype}"
+            )
+        info = np.iinfo(dtype)
+    else:
+        values = values[np.isfinite(values)]
+        info = np.finfo(dtype)
+    if len(values) and (values.min() < info.min or values.max() > info.max):
+        raise ValueError(
+            f"{series.name}: values {values.min()}..{values.max()} are out of "
+            f"range for {dtype}"
+        )
+    return series.astype(dtype)
+
+
+def optimize_dtypes(df, exclude=()):
+    return pd.DataFrame(
+        {
+            column: df[column] if column in exclude else downcast_column(df[column])
+            for column in df.columns
+        },
+        index=df.index,
+    )
+
+
+def compact_schema(schema):
+    # Arrow counterpart for fixed streaming schemas, where value ranges are
+    # not known up front: floats -> float32, timestamps -> seconds, strings
+    # -> dictionaries. Integers keep their width.
+    fields = []
+    for field in schema:
+        field_type = field.type
+        if pa.types.is_floating(field_type):
+            field_type = pa.float32()
+        elif pa.types.is_timestamp(field_type):
+            field_type = pa.timestamp("s", tz=field_type.tz)
+        elif pa.types.is_string(field_type):
+            field_type = pa.dictionary(pa.int32(), pa.string())
+        fields.append(pa.field(field.name, field_type, field.nullable))
+    return pa.schema(fields)
+
+
+def dtype_report(before, after):
+    # In-memory bytes per column before and after compaction
+    report = pd.DataFrame(
+        {
+            "before_dtype": before.dtypes.astype(str),
+            "after_dtype": after.reindex(columns=before.columns).dtypes.astype(str),
+            "before_bytes": before.memory_usage(index=False, deep=True),
+            "after_bytes": after.reindex(columns=before.columns).memory_usage(
+                index=False, deep=True
+            ),
+        }
+    )
+    report["saved_bytes"] = report["before_bytes"] - report["after_bytes"]
+    return report
+
+
+def print_dtype_report(label, before, after):
+    report = dtype_report(before, after)
+    total_before = report["before_bytes"].sum()
+    total_after = report["after_bytes"].sum()
+    print(f"Dtype compaction for {label}:")
+    print(report.to_string())
+    change = (
+        f"{total_before - total_after:,} saved"
+        if total_after <= total_before
+        else f"{total_after - total_before:,} added"
+    )
+    print(f" -> {total_before:,} bytes -> {total_after:,} bytes ({change})")
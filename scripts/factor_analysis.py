@@ -1,66 +1,114 @@
 import pandas as pd
 import numpy as np
 import io
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 import seaborn as sns
-from minio import Minio
+import minio_config
 from factor_analyzer import FactorAnalyzer
+import silver_io
+import stage_cache
 
 # --- Configuration ---
-MINIO_ENDPOINT = "localhost:9000"
-ACCESS_KEY = "admin"
-SECRET_KEY = "admin123"
+# Restrict the analysis to some cities / a date range (None = all).
+# With the partitioned Silver layout only the matching partitions are read.
+ANALYSIS_CITIES = None
+ANALYSIS_START = None
+ANALYSIS_END = None
+
+# Features for the analysis; only these columns are downloaded
+FEATURES = [
+    "temperature_c",
+    "humidity",
+    "rain_mm",
+    "wind_speed_kmh",
+    "weather_visibility_m",  # Weather
+    "vehicle_count",
+    "avg_speed_kmh",
+    "accident_count",  # Traffic
+]
+N_FACTORS = 3
+ROTATION = "varimax"
+GOLD_OUTPUTS = [
+    ("gold", "factor_analysis_loadings.csv"),
+    ("gold", "factor_heatmap.png"),
+    ("gold", "factor_analysis_report.txt"),
+]
+
+
+def cache_key(client):
+    # Stage cache key for the analysis (see stage_cache.py)
+    return stage_cache.stage_key(
+        client,
+        [("silver", "merged_analytical_data.parquet")],
+        {
+            "cities": ANALYSIS_CITIES,
+            "start": ANALYSIS_START,
+            "end": ANALYSIS_END,
+            "features": FEATURES,
+            "n_factors": N_FACTORS,
+            "rotation": ROTATION,
+        },
+        ["factor_analysis", "silver_io"],
+    )
+
 
+def record_outputs(client, key):
+    if key is not None:
+        stage_cache.record(client, "factor_analysis", key, GOLD_OUTPUTS)
 
-def run_factor_analysis():
+
+def run_factor_analysis(merged_df=None):
+    # merged_df: the merged dataset already in memory (e.g. handed over by
+    # pipeline.py); otherwise it is read from Silver.
     print("--- Phase 6: Factor Analysis (Weather Impact Detection) ---")
 
     # 1. Connect to MinIO
-    client = Minio(
-        MINIO_ENDPOINT, access_key=ACCESS_KEY, secret_key=SECRET_KEY, secure=False
-    )
+    client = minio_config.get_client()
+
+    # A dataset handed over in memory is fresh output, so only a run on the
+    # Silver dataset can be a cache hit
+    key = None
+    if merged_df is None:
+        key = cache_key(client)
+        if stage_cache.is_fresh(client, "factor_analysis", key):
+            print(
+                "Gold factor analysis outputs are up to date (stage cache), skipping."
+            )
+            return None
 
     # 2. Load Data from Silver
     try:
-        response = client.get_object("silver", "merged_analytical_data.parquet")
-        data = io.BytesIO(response.read())
-        df = pd.read_parquet(data)
+        scope = dict(
+            cities=ANALYSIS_CITIES,
+            start=ANALYSIS_START,
+            end=ANALYSIS_END,
+            columns=FEATURES,
+        )
+        if merged_df is not None:
+            df = silver_io.filter_rows(merged_df, **scope)
+        else:
+            df = silver_io.read_silver(
+                client, "merged_analytical_data.parquet", **scope
+            )
         print(f"Loaded {len(df)} records.")
     except Exception as e:
         print(f"Error loading data: {e}")
         return
 
     # 3. Prepare Data for Analysis [cite: 161-170]
-    # We need only numeric columns
-    # Fix potential column name issues from merge (x/y)
-    if "visibility_m_x" in df.columns:
-        df.rename(columns={"visibility_m_x": "visibility_m"}, inplace=True)
-
-    # Select features for analysis
-    features = [
-        "temperature_c",
-        "humidity",
-        "rain_mm",
-        "wind_speed_kmh",
-        "visibility_m",  # Weather
-        "vehicle_count",
-        "avg_speed_kmh",
-        "accident_count",  # Traffic
-    ]
-
-    # Ensure all are numeric and handle NaNs
-    analysis_df = df[features].apply(pd.to_numeric, errors="coerce").fillna(0)
+    # The merged schema already fixes names and numeric dtypes; handle NaNs
+    analysis_df = df[FEATURES].fillna(0)
 
     # 4. Perform Factor Analysis
-    print("Running Factor Analysis (3 Factors)...")
-    fa = FactorAnalyzer(n_factors=3, rotation="varimax")
+    print(f"Running Factor Analysis ({N_FACTORS} Factors)...")
+    fa = FactorAnalyzer(n_factors=N_FACTORS, rotation=ROTATION)
     fa.fit(analysis_df)
 
     # Get Factor Loadings (Correlations between variables and factors)
     loadings = pd.DataFrame(
         fa.loadings_,
         index=analysis_df.columns,
-        columns=["Factor_1", "Factor_2", "Factor_3"],
+        columns=[f"Factor_{i + 1}" for i in range(N_FACTORS)],
     )
 
     print("\nFactor Loadings:")
@@ -82,14 +130,17 @@ def run_factor_analysis():
     print(" -> Saved factor_analysis_loadings.csv to Gold")
 
     # B. Generate Interpretation Heatmap
-    plt.figure(figsize=(10, 8))
-    sns.heatmap(loadings, annot=True, cmap="coolwarm", center=0)
-    plt.title("Factor Analysis: Weather Variables vs Traffic Patterns")
-    plt.ylabel("Observed Variables")
-    plt.xlabel("Latent Factors (Hidden Drivers)")
+    # A standalone Figure (no pyplot state), so plotting is safe while other
+    # pipeline stages plot in parallel threads
+    fig = Figure(figsize=(10, 8))
+    ax = fig.subplots()
+    sns.heatmap(loadings, annot=True, cmap="coolwarm", center=0, ax=ax)
+    ax.set_title("Factor Analysis: Weather Variables vs Traffic Patterns")
+    ax.set_ylabel("Observed Variables")
+    ax.set_xlabel("Latent Factors (Hidden Drivers)")
 
     img_buffer = io.BytesIO()
-    plt.savefig(img_buffer, format="png")
+    fig.savefig(img_buffer, format="png")
     img_buffer.seek(0)
     client.put_object(
         "gold",
@@ -124,6 +175,8 @@ def run_factor_analysis():
         content_type="text/plain",
     )
     print(" -> Saved factor_analysis_report.txt to Gold")
+    record_outputs(client, key)
+    return loadings
 
 
 if __name__ == "__main__":
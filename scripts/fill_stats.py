@@ -0,0 +1,222 @@
+import json
+import math
+import numpy as np
+import pandas as pd
+
+# Mergeable column statistics for the Silver null fills. Every sketch has
+# update(values), merge(other) and to_dict()/from_dict() so statistics can be
+# built chunk by chunk, merged across workers and cached as JSON.
+
+KLL_K = 200
+# Seed for the KLL compaction coin flips. Fixed, so the same Bronze object
+# always gives the same fill values (and Silver output) run after run.
+KLL_SEED = 0
+TOPK_CAPACITY = 64
+
+
+class KLLSketch:
+    # KLL quantile sketch: level h holds items of weight 2**h. A full level is
+    # sorted and every other item (random offset) is promoted to the next
+    # level, so memory stays O(k log n) with rank error around 1.7 / k.
+    def __init__(self, k=KLL_K, seed=KLL_SEED):
+        self.k = k
+        self.levels = [np.empty(0)]
+        self.rng = np.random.default_rng(seed)
+
+    def capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self.compress()
+        return self
+
+    def merge(self, other):
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.compress()
+        return self
+
+    def compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self.capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                # An odd item out stays behind so weights add up exactly
+                if len(items) % 2:
+                    items, leftover = items[:-1], items[-1:]
+                else:
+                    leftover = np.empty(0)
+                promoted = items[self.rng.integers(0, 2) :: 2]
+                self.levels[level] = leftover
+                self.levels[level + 1] = np.concatenate(
+                    [self.levels[level + 1], promoted]
+                )
+            level += 1
+
+    def quantile(self, q):
+        items = np.concatenate(self.levels)
+        if len(items) == 0:
+            return np.nan
+        weights = np.concatenate(
+            [
+                np.full(len(level_items), 2.0**level)
+                for level, level_items in enumerate(self.levels)
+            ]
+        )
+        order = np.argsort(items)
+        cumulative = np.cumsum(weights[order])
+        position = np.searchsorted(cumulative, q * cumulative[-1])
+        return float(items[order][min(position, len(items) - 1)])
+
+    def result(self):
+        return self.quantile(0.5)
+
+    def to_dict(self):
+        return {"k": self.k, "levels": [items.tolist() for items in self.levels]}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(k=data["k"])
+        sketch.levels = [np.asarray(items, dtype=float) for items in data["levels"]]
+        return sketch
+
+
+class ExactQuantiles:
+    # Keeps every value; same interface as KLLSketch for small data and checks.
+    def __init__(self):
+        self.values = np.empty(0)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        self.values = np.concatenate([self.values, values[~np.isnan(values)]])
+        return self
+
+    def merge(self, other):
+        self.values = np.concatenate([self.values, other.values])
+        return self
+
+    def result(self):
+        return float(np.median(self.values)) if len(self.values) else np.nan
+
+    def to_dict(self):
+        return {"values": self.values.tolist()}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls()
+        sketch.values = np.asarray(data["values"], dtype=float)
+        return sketch
+
+
+class TopKCounter:
+    # Misra-Gries heavy hitters with `capacity` counters. Exact while a column
+    # has at most `capacity` distinct values, which holds for season,
+    # weather_condition and congestion_level.
+    def __init__(self, capacity=TOPK_CAPACITY):
+        self.capacity = capacity
+        self.counts = {}
+
+    def update(self, values):
+        batch = pd.Series(values).dropna().value_counts()
+        return self.add_counts(batch.to_dict())
+
+    def merge(self, other):
+        return self.add_counts(other.counts)
+
+    def add_counts(self, counts):
+        for value, count in counts.items():
+            self.counts[value] = self.counts.get(value, 0) + int(count)
+        if len(self.counts) > self.capacity:
+            # Subtract the (capacity + 1)-th largest count and drop non-positives
+            cut = sorted(self.counts.values(), reverse=True)[self.capacity]
+            self.counts = {v: c - cut for v, c in self.counts.items() if c > cut}
+        return self
+
+    def result(self):
+        if not self.counts:
+            return None
+        # Ties resolve to the smallest value, like Series.mode()[0]
+        top = max(self.counts.values())
+        return min(v for v, c in self.counts.items() if c == top)
+
+    def to_dict(self):
+        return {"capacity": self.capacity, "counts": self.counts}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(capacity=data["capacity"])
+        sketch.counts = {v: int(c) for v, c in data["counts"].items()}
+        return sketch
+
+
+QUANTILE_SKETCHES = {"kll": KLLSketch, "exact": ExactQuantiles}
+FREQUENCY_SKETCHES = {"topk": TopKCounter}
+
+
+def new_fill_stats(
+    median_columns, mode_columns, median_sketch="kll", mode_sketch="topk"
+):
+    return {
+        "median": {
+            column: QUANTILE_SKETCHES[median_sketch]() for column in median_columns
+        },
+        "mode": {column: FREQUENCY_SKETCHES[mode_sketch]() for column in mode_columns},
+    }
+
+
+def update_fill_stats(stats, chunk):
+    for column, sketch in stats["median"].items():
+        sketch.update(chunk[column].to_numpy(dtype=float))
+    for column, sketch in stats["mode"].items():
+        sketch.update(chunk[column])
+    return stats
+
+
+def merge_fill_stats(left, right):
+    for kind in ("median", "mode"):
+        for column, sketch in left[kind].items():
+            sketch.merge(right[kind][column])
+    return left
+
+
+def fill_values(stats):
+    # Same shape as silver.exact_fill_stats, ready for the fill helpers
+    return {
+        kind: {column: sketch.result() for column, sketch in sketches.items()}
+        for kind, sketches in stats.items()
+    }
+
+
+def dumps_fill_stats(stats):
+    return json.dumps(
+        {
+            kind: {
+                column: {"type": type(sketch).__name__, **sketch.to_dict()}
+                for column, sketch in sketches.items()
+            }
+            for kind, sketches in stats.items()
+        }
+    )
+
+
+def loads_fill_stats(text):
+    sketch_types = {
+        cls.__name__: cls
+        for cls in [*QUANTILE_SKETCHES.values(), *FREQUENCY_SKETCHES.values()]
+    }
+    return {
+        kind: {
+            column: sketch_types[data["type"]].from_dict(data)
+            for column, data in sketches.items()
+        }
+        for kind, sketches in json.loads(text).items()
+    }
@@ -0,0 +1,266 @@
+import numpy as np
+import dirty_data
+import g_traffic
+import g_weather
+import synthetic_io
+
+# Joint weather + traffic generator. Weather is drawn per (city, hour) with
+# clustered severe spells, and the traffic of every area in that city-hour is
+# conditioned on it, on top of daily and weekly cycles. Unlike the separate
+# generators, the data has structure for factor analysis and the Monte Carlo
+# simulation to find, and realistic skew (dominant areas and conditions,
+# rare incident bursts). Output matches the other generators:
+# weather_data/city=<city>/part-<n> and traffic_data/city=<city>/part-<n>,
+# CHUNK_PERIODS hours of one city per part.
+
+CITIES = ["London"]
+START = "2024-01-01"
+PERIODS = 5500
+STEP_SECONDS = 3600
+CHUNK_PERIODS = 100_000
+OUTPUT_FORMAT = "csv"  # or "parquet"
+DESTINATION = "local"  # or "bronze"
+OUTPUT_DIR = g_weather.OUTPUT_DIR
+# Each (city, chunk) draws from its own stream seeded by (SEED, city, chunk)
+SEED = 0
+
+# --- Weather ---
+# Severe weather comes in spells: hours switch between a calm and a severe
+# state, severe hours make up SEVERE_SHARE of the time and a severe hour is
+# followed by another one with probability SEVERE_PERSISTENCE.
+SEVERE_SHARE = 0.08
+SEVERE_PERSISTENCE = 0.9
+# Mean temperature, yearly swing and daily swing (degrees C)
+MEAN_TEMPERATURE = 11.0
+YEARLY_SWING = 8.0
+DAILY_SWING = 4.0
+
+# --- Traffic ---
+# How strongly weather drives traffic (volume, speed, accidents, road
+# condition, visibility): 0 = independent, 1 = default effects
+WEATHER_IMPACT = 1.0
+# Vehicles per hour at the daily peak in the busiest area. Other areas get
+# a Zipf share of it (rank ** -AREA_SKEW).
+PEAK_VEHICLES = 3000
+AREA_SKEW = 1.0
+# Relative demand per hour of day (rush hours at 8:00 and 17:00) and per day
+# of the week, Monday first
+HOURLY_DEMAND = np.array(
+    [0.15, 0.1, 0.08, 0.08, 0.12, 0.3, 0.6, 0.9, 1.0, 0.8, 0.65, 0.65]
+    + [0.7, 0.7, 0.7, 0.75, 0.9, 1.0, 0.9, 0.7, 0.5, 0.4, 0.3, 0.2]
+)
+DAILY_DEMAND = np.array([1.0, 1.0, 1.0, 1.0, 1.05, 0.75, 0.6])
+FREE_FLOW_SPEED_KMH = 70.0
+# Accidents: Poisson with ACCIDENT_RATE per hour at average load, plus rare
+# multi-vehicle incidents (probability INCIDENT_RATE) whose size is
+# Pareto-distributed with shape INCIDENT_TAIL (smaller = heavier tail).
+ACCIDENT_RATE = 0.4
+INCIDENT_RATE = 0.002
+INCIDENT_TAIL = 1.5
+
+# Messiness per dataset (dirty_data.py specs); {} writes clean data
+WEATHER_MESSINESS = g_weather.MESSINESS
+TRAFFIC_MESSINESS = g_traffic.MESSINESS
+
+
+def severe_spells(n, rng):
+    # Two-state chain drawn as alternating geometric run lengths, so the
+    # spells cost a handful of array operations instead of a loop over hours
+    leave_severe = 1 - SEVERE_PERSISTENCE
+    enter_severe = leave_severe * SEVERE_SHARE / (1 - SEVERE_SHARE)
+    # Enough runs to cover n hours with a wide margin
+    runs = int(n * enter_severe * 2) + 16
+    calm = rng.geometric(enter_severe, runs)
+    severe = rng.geometric(leave_severe, runs)
+    lengths = np.column_stack([calm, severe]).ravel()
+    states = np.tile([False, True], runs)
+    if rng.random() < SEVERE_SHARE:
+        lengths, states = lengths[1:], states[1:]
+    spells = np.repeat(states, lengths)
+    while len(spells) < n:
+        spells = np.concatenate([spells, severe_spells(n - len(spells), rng)])
+    return spells[:n]
+
+
+def joint_weather(city_index, start, stop, rng):
+    n = stop - start
+    position = np.arange(start, stop, dtype=np.int64)
+    date_time = np.datetime64(START, "s") + position * STEP_SECONDS
+    month = date_time.astype("datetime64[M]").astype(np.int64) % 12
+    day_of_year = (
+        (date_time - date_time.astype("datetime64[Y]"))
+        .astype("timedelta64[D]")
+        .astype(np.int64)
+    )
+    hour = (date_time.astype("datetime64[h]").astype(np.int64)) % 24
+    severe = severe_spells(n, rng)
+
+    temperature = (
+        MEAN_TEMPERATURE
+        - YEARLY_SWING * np.cos(2 * np.pi * (day_of_year - 15) / 365)
+        + DAILY_SWING * np.sin(2 * np.pi * (hour - 9) / 24)
+        - 3 * severe
+        + rng.normal(0, 2, n)
+    )
+    rain = np.where(
+        severe,
+        rng.exponential(8, n),
+        rng.exponential(0.6, n) * (rng.random(n) < 0.2),
+    )
+    wind = np.where(severe, rng.gamma(4, 12, n), rng.gamma(2, 6, n))
+    visibility = np.where(
+        severe,
+        rng.lognormal(np.log(1200), 0.6, n),
+        10000 - rng.exponential(1500, n),
+    ).clip(50, 10000)
+    humidity = (65 + 20 * severe + 10 * (rain > 0) + rng.normal(0, 8, n)).clip(20, 100)
+    pressure = 1013 - 18 * severe + rng.normal(0, 6, n)
+
+    # Skewed conditions: mostly Clear; severe hours are Storm/Rain/Fog, or
+    # Snow below freezing
+    conditions = g_weather.CONDITIONS  # Clear, Rain, Fog, Storm, Snow
+    calm_condition = rng.choice([0, 1, 2], n, p=[0.8, 0.15, 0.05])
+    severe_condition = rng.choice([3, 1, 2], n, p=[0.45, 0.4, 0.15])
+    condition = np.where(severe, severe_condition, calm_condition)
+    condition = np.where((condition != 0) & (temperature < 0), 4, condition)
+
+    columns = {
+        "weather_id": 5001 + city_index * PERIODS + position,
+        "date_time": date_time,
+        "city": np.full(n, city_index),
+        "season": g_weather.MONTH_SEASON[month],
+        "temperature_c": temperature,
+        "humidity": humidity.round(),
+        "rain_mm": rain,
+        "wind_speed_kmh": wind,
+        "visibility_m": visibility.round(),
+        "weather_condition": condition,
+        "air_pressure_hpa": pressure,
+    }
+    categories = {
+        "city": CITIES,
+        "season": g_weather.SEASONS,
+        "weather_condition": conditions,
+    }
+    return columns, categories
+
+
+def severity(weather):
+    # 0 (calm) .. 1 (storm) from the drawn weather, not the hidden state, so
+    # the link is visible in the data
+    return np.clip(
+        weather["rain_mm"] / 20
+        + weather["wind_speed_kmh"] / 120
+        + (10000 - weather["visibility_m"]) / 20000,
+        0,
+        1,
+    )
+
+
+def joint_traffic(first_id, start, areas, weather, rng):
+    # One row per (hour, area), the areas of an hour next to each other
+    n = len(weather["date_time"])
+    a = len(areas)
+    date_time = np.repeat(weather["date_time"], a)
+    area = np.tile(np.arange(a), n)
+    hour = date_time.astype("datetime64[h]").astype(np.int64) % 24
+    # 1970-01-01 was a Thursday
+    weekday = (date_time.astype("datetime64[D]").astype(np.int64) + 3) % 7
+    impact = WEATHER_IMPACT * np.repeat(severity(weather), a)
+
+    area_share = np.arange(1, a + 1) ** -AREA_SKEW
+    demand = (
+        PEAK_VEHICLES * area_share[area] * HOURLY_DEMAND[hour] * DAILY_DEMAND[weekday]
+    )
+    # Bad weather keeps some drivers home
+    vehicles = rng.poisson(demand * (1 - 0.25 * impact))
+    load = vehicles / (PEAK_VEHICLES * area_share[area])
+
+    speed = (
+        FREE_FLOW_SPEED_KMH * (1 - 0.55 * load.clip(0, 1.2)) * (1 - 0.4 * impact)
+        + rng.normal(0, 4, n * a)
+    ).clip(3, 120)
+    accidents = rng.poisson(ACCIDENT_RATE * (0.5 + load) * (1 + 3 * impact))
+    incidents = rng.random(n * a) < INCIDENT_RATE * (1 + 3 * impact)
+    accidents = accidents + incidents * np.floor(
+        rng.pareto(INCIDENT_TAIL, n * a) + 2
+    ).astype(np.int64)
+
+    slowdown = 1 - speed / FREE_FLOW_SPEED_KMH
+    congestion = np.digitize(slowdown + rng.normal(0, 0.05, n * a), [0.35, 0.6])
+    # Road condition and visibility follow the weather of the row's own hour
+    # for a WEATHER_IMPACT share of the rows, and of a random hour of the
+    # chunk otherwise: same distributions, weaker (at 0 no) link
+    own_hour = np.repeat(np.arange(n), a)
+    coupled = rng.random(n * a) < min(WEATHER_IMPACT, 1)
+    hour_used = np.where(coupled, own_hour, rng.integers(0, n, n * a))
+    snow = weather["weather_condition"][hour_used] == 4
+    rain = weather["rain_mm"][hour_used]
+    # Dry, Wet, Snowy, Damaged
+    road = np.where(snow, 2, np.where(rain > 0.5, 1, 0))
+    road = np.where(rng.random(n * a) < 0.02, 3, road)
+    visibility = (
+        weather["visibility_m"][hour_used] * rng.lognormal(0, 0.1, n * a)
+    ).clip(50, 10000)
+
+    position = np.repeat(np.arange(start, start + n, dtype=np.int64), a)
+    return {
+        # Each area has its own id range, as in g_traffic's sharded output
+        "traffic_id": first_id + area * PERIODS + position,
+        "date_time": date_time,
+        "city": np.repeat(weather["city"], a),
+        "area": area,
+        "vehicle_count": vehicles,
+        "avg_speed_kmh": speed,
+        "accident_count": accidents,
+        "congestion_level": congestion,
+        "road_condition": road,
+        "visibility_m": visibility.round(),
+    }
+
+
+def generate_joint_dataset():
+    rows = {"weather_data": 0, "traffic_data": 0}
+    first_traffic_id = 9001
+    for city_index, city in enumerate(CITIES):
+        areas = g_traffic.city_areas(city)
+        for part, start in enumerate(range(0, PERIODS, CHUNK_PERIODS)):
+            stop = min(start + CHUNK_PERIODS, PERIODS)
+            rng = np.random.default_rng(
+                None if SEED is None else [SEED, city_index, part]
+            )
+            weather, weather_categories = joint_weather(city_index, start, stop, rng)
+            traffic = joint_traffic(first_traffic_id, start, areas, weather, rng)
+            traffic_categories = {
+                "city": CITIES,
+                "area": areas,
+                "congestion_level": g_traffic.CONGESTION_LEVELS,
+                "road_condition": g_traffic.ROAD_CONDITIONS,
+            }
+            frames = {
+                "weather_data": dirty_data.corrupt(
+                    weather, weather_categories, WEATHER_MESSINESS, rng
+                ),
+                "traffic_data": dirty_data.corrupt(
+                    traffic, traffic_categories, TRAFFIC_MESSINESS, rng
+                ),
+            }
+            for dataset, df in frames.items():
+                path = synthetic_io.write_part(
+                    df,
+                    f"{dataset}/city={city}/part-{part:05d}.{OUTPUT_FORMAT}",
+                    OUTPUT_FORMAT,
+                    DESTINATION,
+                    OUTPUT_DIR,
+                )
+                rows[dataset] += len(df)
+                print(f" -> {path} ({len(df)} rows)")
+        first_traffic_id += len(areas) * PERIODS
+    print(
+        f"Generated {rows['weather_data']} weather / {rows['traffic_data']} traffic rows"
+    )
+    return rows
+
+
+if __name__ == "__main__":
+    generate_joint_dataset()
@@ -1,11 +1,57 @@
-import pandas as pd
+import os
 import numpy as np
-import random
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
+import dirty_data
+import synthetic_io
 
 NUM_RECORDS = 5500
 CITY = "London"
 
+# "legacy" writes one traffic_data.csv with generate_traffic_data below;
+# "sharded" writes a partitioned dataset with generate_traffic_dataset, for
+# load tests.
+GENERATOR = "legacy"
+
+# --- Sharded generator ---
+# One row per (city, area, hour): every area of every city gets PERIODS
+# rows, STEP_SECONDS apart from START. The space is cut into shards of
+# SHARD_PERIODS hours of one area, generated on WORKERS processes and
+# written as traffic_data/city=<city>/area=<area>/part-<n>.<OUTPUT_FORMAT>,
+# under OUTPUT_DIR or in the bronze bucket (DESTINATION).
+CITIES = [CITY]
+CITY_AREAS = {"London": ["Camden", "Chelsea", "Islington", "Southwark", "Kensington"]}
+# Cities without an entry above get this many areas named "<city> Area <n>"
+AREAS_PER_CITY = 5
+START = "2024-01-01"
+PERIODS = NUM_RECORDS
+STEP_SECONDS = 3600
+SHARD_PERIODS = 250_000
+WORKERS = 0  # 0 = every core
+OUTPUT_FORMAT = "csv"  # or "parquet"
+DESTINATION = "local"  # or "bronze"
+OUTPUT_DIR = "D:\\Data Engineer\\Data Engineering Projects\\Final Big Data Project\\SyntheticData"
+# Each shard draws from its own stream seeded by (SEED, city, area, shard),
+# so a shard's bytes only depend on the seed, never on the worker count
+SEED = 0
+
+CONGESTION_LEVELS = ["Low", "Medium", "High"]
+ROAD_CONDITIONS = ["Dry", "Wet", "Snowy", "Damaged"]
+
+# Messiness of both generators (a dirty_data.py spec); the sharded one
+# applies it per shard
+MESSINESS = {
+    "duplicate_rate": 100 / 5500,
+    "null_rates": {"area": 0.05, "traffic_id": 0.02},
+    "outliers": {
+        "avg_speed_kmh": (50 / 5600, "uniform", [-50, -1]),
+        "vehicle_count": (30 / 5600, "integers", [20000, 50000]),
+        "accident_count": (10 / 5600, "integers", [50, 100]),
+    },
+    "bad_timestamp_rate": 20 / 5600,
+    "bad_timestamps": ["2099-00-00 99:99"],
+}
+
 
 def generate_traffic_data():
 
@@ -30,37 +76,117 @@ def generate_traffic_data():
         "visibility_m": np.random.randint(50, 10000, size=NUM_RECORDS),
     }
 
-    df = pd.DataFrame(data)
+    data["date_time"] = np.array(dates, dtype="datetime64[s]")
+    df = dirty_data.corrupt(data, {}, MESSINESS, np.random.default_rng())
 
-    df = pd.concat([df, df.sample(100)])
+    print("saving traffic_data.csv...")
+    df.to_csv(
+        "D:\\Data Engineer\\Data Engineering Projects\\Final Big Data Project\\SyntheticData\\traffic_data.csv",
+        index=False,
+    )
 
-    df.reset_index(drop=True, inplace=True)
 
-    df.loc[random.sample(range(len(df)), 50), "avg_speed_kmh"] = np.random.uniform(
-        -50, -1, 50
+def city_areas(city):
+    return CITY_AREAS.get(
+        city, [f"{city} Area {n}" for n in range(1, AREAS_PER_CITY + 1)]
     )
 
-    df.loc[random.sample(range(len(df)), 30), "vehicle_count"] = np.random.randint(
-        20000, 50000, 30
-    )
 
-    df.loc[random.sample(range(len(df)), 10), "accident_count"] = np.random.randint(
-        50, 100, 10
-    )
+def settings():
+    # Passed to the workers explicitly, so changes made to this module's
+    # settings at runtime also reach spawned processes
+    return {
+        name: globals()[name]
+        for name in (
+            "START",
+            "STEP_SECONDS",
+            "OUTPUT_FORMAT",
+            "DESTINATION",
+            "OUTPUT_DIR",
+            "SEED",
+            "MESSINESS",
+        )
+    }
 
-    df.loc[df.sample(frac=0.05).index, "area"] = np.nan
 
-    df.loc[df.sample(frac=0.02).index, "traffic_id"] = np.nan
+def plan_shards():
+    # (seed key, city, area, shard, first traffic_id, start, stop) per shard
+    shards = []
+    first_id = 9001
+    for city_index, city in enumerate(CITIES):
+        for area_index, area in enumerate(city_areas(city)):
+            for shard, start in enumerate(range(0, PERIODS, SHARD_PERIODS)):
+                stop = min(start + SHARD_PERIODS, PERIODS)
+                seed_key = (city_index, area_index, shard)
+                shards.append(
+                    (seed_key, city, area, shard, first_id + start, start, stop)
+                )
+            first_id += PERIODS
+    return shards
+
+
+def traffic_shard(first_id, start, stop, config, rng):
+    # Clean rows of one shard as arrays; categoricals as codes
+    n = stop - start
+    position = np.arange(start, stop, dtype=np.int64)
+    return {
+        "traffic_id": first_id + np.arange(n, dtype=np.int64),
+        "date_time": np.datetime64(config["START"], "s")
+        + position * config["STEP_SECONDS"],
+        "city": np.zeros(n, dtype=np.int64),
+        "area": np.zeros(n, dtype=np.int64),
+        "vehicle_count": rng.integers(0, 5000, n),
+        "avg_speed_kmh": rng.uniform(3, 120, n),
+        "accident_count": rng.integers(0, 10, n),
+        "congestion_level": rng.integers(0, len(CONGESTION_LEVELS), n),
+        "road_condition": rng.integers(0, len(ROAD_CONDITIONS), n),
+        "visibility_m": rng.integers(50, 10000, n),
+    }
 
-    df["date_time"] = df["date_time"].astype(object)
-    df.loc[random.sample(range(len(df)), 20), "date_time"] = "2099-00-00 99:99"
 
-    print("saving traffic_data.csv...")
-    df.to_csv(
-        "D:\\Data Engineer\\Data Engineering Projects\\Final Big Data Project\\SyntheticData\\traffic_data.csv",
-        index=False,
+def generate_shard(shard, config):
+    seed_key, city, area, part, first_id, start, stop = shard
+    seed = None if config["SEED"] is None else [config["SEED"], *seed_key]
+    rng = np.random.default_rng(seed)
+    categories = {
+        "city": [city],
+        "area": [area],
+        "congestion_level": CONGESTION_LEVELS,
+        "road_condition": ROAD_CONDITIONS,
+    }
+    df = dirty_data.corrupt(
+        traffic_shard(first_id, start, stop, config, rng),
+        categories,
+        config["MESSINESS"],
+        rng,
+    )
+    path = synthetic_io.write_part(
+        df,
+        f"traffic_data/city={city}/area={area}/part-{part:05d}.{config['OUTPUT_FORMAT']}",
+        config["OUTPUT_FORMAT"],
+        config["DESTINATION"],
+        config["OUTPUT_DIR"],
     )
+    return path, len(df)
+
+
+def generate_traffic_dataset():
+    shards = plan_shards()
+    config = settings()
+    workers = WORKERS or os.cpu_count()
+    print(f"Generating {len(shards)} traffic shards on {workers} process(es)...")
+    rows = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for path, shard_rows in pool.map(
+            generate_shard, shards, [config] * len(shards)
+        ):
+            rows += shard_rows
+            print(f" -> {path} ({shard_rows} rows, {rows} total)")
+    return rows
 
 
 if __name__ == "__main__":
-    generate_traffic_data()
+    if GENERATOR == "sharded":
+        generate_traffic_dataset()
+    else:
+        generate_traffic_data()
@@ -1,11 +1,55 @@
-import pandas as pd
 import numpy as np
-import random
+import dirty_data
+import synthetic_io
 from datetime import datetime, timedelta
 
 NUM_RECORDS = 5500
 CITY = "London"
 
+# "legacy" writes one weather_data.csv with generate_weather_data below;
+# "vectorized" writes a chunked, partitioned dataset with
+# generate_weather_dataset, for load-test volumes.
+GENERATOR = "legacy"
+
+# --- Vectorized generator ---
+# Every city gets PERIODS rows, STEP_SECONDS apart from START. Rows are made
+# and written CHUNK_ROWS at a time as
+# weather_data/city=<city>/part-<n>.<OUTPUT_FORMAT>, under OUTPUT_DIR or in
+# the bronze bucket (DESTINATION), so memory depends on CHUNK_ROWS only
+# (1000 cities x 10 years of hours is ~88M rows).
+CITIES = [CITY]
+START = "2024-01-01"
+PERIODS = NUM_RECORDS
+STEP_SECONDS = 3600
+CHUNK_ROWS = 1_000_000
+OUTPUT_FORMAT = "csv"  # or "parquet"
+DESTINATION = "local"  # or "bronze"
+OUTPUT_DIR = "D:\\Data Engineer\\Data Engineering Projects\\Final Big Data Project\\SyntheticData"
+# Set to an int for reproducible output; each (city, chunk) gets its own stream
+SEED = None
+
+# Season and temperature range (uniform) per month, January first
+SEASONS = ["Winter", "Spring", "Summer", "Autumn"]
+MONTH_SEASON = np.array([0, 0, 1, 1, 1, 2, 2, 2, 3, 3, 3, 0])
+SEASON_TEMPERATURE = np.array([[-5, 15], [8, 15], [10, 35], [8, 15]])
+CONDITIONS = ["Clear", "Rain", "Fog", "Storm", "Snow"]
+
+# Messiness of both generators (a dirty_data.py spec); the vectorized one
+# applies it per chunk
+MESSINESS = {
+    "duplicate_rate": 100 / 5500,
+    "null_rate": 0.05,
+    "outliers": {
+        "temperature_c": (50 / 5600, "choice", [-30, 60]),
+        "humidity": (50 / 5600, "choice", [-10, 150]),
+        "rain_mm": (50 / 5600, "uniform", [80, 150]),
+        "wind_speed_kmh": (50 / 5600, "uniform", [150, 250]),
+        "visibility_m": (50 / 5600, "integers", [20000, 50000]),
+    },
+    "bad_timestamp_rate": 20 / 5600,
+    "bad_timestamps": ["2099-13-40 25:61"],
+}
+
 
 def generate_weather_data():
     weather_id = np.arange(5001, 5001 + NUM_RECORDS)
@@ -45,32 +89,8 @@ def generate_weather_data():
             temp = np.random.uniform(8, 15)
         data["temperature_c"].append(temp)
 
-    df = pd.DataFrame(data)
-
-    df = pd.concat([df, df.sample(100)])
-
-    df.reset_index(drop=True, inplace=True)
-
-    df.loc[random.sample(range(len(df)), 50), "temperature_c"] = np.random.choice(
-        [-30, 60], 50
-    )
-    df.loc[random.sample(range(len(df)), 50), "humidity"] = np.random.choice(
-        [-10, 150], 50
-    )
-    df.loc[random.sample(range(len(df)), 50), "rain_mm"] = np.random.uniform(
-        80, 150, 50
-    )
-    df.loc[random.sample(range(len(df)), 50), "wind_speed_kmh"] = np.random.uniform(
-        150, 250, 50
-    )
-    df.loc[random.sample(range(len(df)), 50), "visibility_m"] = np.random.randint(
-        20000, 50000, 50
-    )
-    for col in df.columns:
-        df.loc[df.sample(frac=0.05).index, col] = np.nan
-
-    df["date_time"] = df["date_time"].astype(object)
-    df.loc[random.sample(range(len(df)), 20), "date_time"] = "2099-13-40 25:61"
+    data["date_time"] = np.array(dates, dtype="datetime64[s]")
+    df = dirty_data.corrupt(data, {}, MESSINESS, np.random.default_rng())
 
     print("save weather_data.csv...")
     df.to_csv(
@@ -79,5 +99,55 @@ def generate_weather_data():
     )
 
 
+def weather_chunk(city_index, start, stop, rng):
+    # Clean rows start..stop of one city as arrays; categoricals as codes
+    n = stop - start
+    position = np.arange(start, stop, dtype=np.int64)
+    date_time = np.datetime64(START, "s") + position * STEP_SECONDS
+    month = date_time.astype("datetime64[M]").astype(np.int64) % 12
+    season = MONTH_SEASON[month]
+    low, high = SEASON_TEMPERATURE[season].T
+    return {
+        "weather_id": 5001 + city_index * PERIODS + position,
+        "date_time": date_time,
+        "city": np.full(n, city_index),
+        "season": season,
+        "temperature_c": rng.uniform(low, high),
+        "humidity": rng.integers(20, 100, n),
+        "rain_mm": rng.exponential(5, n),
+        "wind_speed_kmh": rng.uniform(0, 80, n),
+        "visibility_m": rng.integers(50, 10000, n),
+        "weather_condition": rng.integers(0, len(CONDITIONS), n),
+        "air_pressure_hpa": rng.uniform(950, 1050, n),
+    }
+
+
+def generate_weather_dataset():
+    categories = {"city": CITIES, "season": SEASONS, "weather_condition": CONDITIONS}
+    rows = 0
+    for city_index, city in enumerate(CITIES):
+        for part, start in enumerate(range(0, PERIODS, CHUNK_ROWS)):
+            rng = np.random.default_rng(
+                None if SEED is None else [SEED, city_index, part]
+            )
+            columns = weather_chunk(
+                city_index, start, min(start + CHUNK_ROWS, PERIODS), rng
+            )
+            df = dirty_data.corrupt(columns, categories, MESSINESS, rng)
+            path = synthetic_io.write_part(
+                df,
+                f"weather_data/city={city}/part-{part:05d}.{OUTPUT_FORMAT}",
+                OUTPUT_FORMAT,
+                DESTINATION,
+                OUTPUT_DIR,
+            )
+            rows += len(df)
+            print(f" -> {path} ({len(df)} rows, {rows} total)")
+    return rows
+
+
 if __name__ == "__main__":
-    generate_weather_data()
+    if GENERATOR == "vectorized":
+        generate_weather_dataset()
+    else:
+        generate_weather_data()
@@ -1,21 +1,14 @@
 import io
-from minio import Minio
 from hdfs import InsecureClient
+import minio_config
 
-MINIO_ENDPOINT = "minio:9000"
-MINIO_ACCESS_KEY = "admin"
-MINIO_SECRET_KEY = "admin123"
 HDFS_ENDPOINT = "http://namenode:9870"
 HDFS_USER = "root"
 
 
 def sync_silver_to_hdfs():
-    minio_client = Minio(
-        MINIO_ENDPOINT,
-        access_key=MINIO_ACCESS_KEY,
-        secret_key=MINIO_SECRET_KEY,
-        secure=False,
-    )
+    # Runs inside the compose network: MINIO_ENDPOINT=minio:9000
+    minio_client = minio_config.get_client()
 
     try:
         hdfs_client = InsecureClient(HDFS_ENDPOINT, user=HDFS_USER)
@@ -30,7 +23,15 @@ def sync_silver_to_hdfs():
         "traffic_cleaned.parquet": "/traffic_data",
     }
 
+    # Incremental Silver runs append parts under "<name>/"; sync those as well
+    objects_to_sync = []
     for file_name, hdfs_folder in files_map.items():
+        objects_to_sync.append((file_name, hdfs_folder))
+        prefix = file_name.removesuffix(".parquet") + "/"
+        for obj in minio_client.list_objects("silver", prefix=prefix, recursive=True):
+            objects_to_sync.append((obj.object_name, hdfs_folder))
+
+    for file_name, hdfs_folder in objects_to_sync:
         try:
             response = minio_client.get_object("silver", file_name)
             data_bytes = response.read()
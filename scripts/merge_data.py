@@ -1,58 +1,365 @@
+import os
+import tempfile
 import pandas as pd
-import io
-from minio import Minio
+import pyarrow.parquet as pq
+import minio_config
+import silver_io
+import stage_cache
+import transfer
+from merged_schema import (
+    MERGED_SCHEMA,
+    prefix_collisions,
+    to_merged_frame,
+    to_merged_table,
+)
+from dtype_optimizer import print_dtype_report
 
-MINIO_ENDPOINT = "localhost:9000"
-ACCESS_KEY = "admin"
-SECRET_KEY = "admin123"
+# "hash" joins both tables in memory. "sort_merge" walks the traffic data one
+# (city, month) slice at a time, joins it to the matching weather slice and
+# appends the result, so only one slice of each table is resident. "duckdb"
+# runs the join as a DuckDB query straight over the Silver Parquet files in
+# MinIO, on every core, spilling to disk when it outgrows memory.
+MERGE_ENGINE = "hash"
+# sort_merge only: match each traffic row to the nearest weather reading of
+# its city within this many minutes. None keeps exact timestamp equality.
+MERGE_TOLERANCE_MINUTES = None
+MERGE_KEYS = ["date_time", "city"]
 
+# duckdb only
+DUCKDB_MEMORY_LIMIT = "2GB"
+DUCKDB_TEMP_DIR = os.path.join(tempfile.gettempdir(), "merge_duckdb_spill")
+DUCKDB_THREADS = 0  # 0 = all cores
+# Re-run the pandas join after the duckdb merge and compare the rows on the
+# real data (tests/test_merge_parity.py covers the engines themselves)
+CHECK_MERGE_PARITY = False
 
-def merge_datasets():
 
-    client = Minio(
-        MINIO_ENDPOINT, access_key=ACCESS_KEY, secret_key=SECRET_KEY, secure=False
+def merge_slices(client):
+    # (city, month start) for every slice of traffic data, in order
+    partitions = silver_io.list_partitions(client, "traffic_cleaned.parquet")
+    if partitions.empty:
+        keys = silver_io.read_silver(
+            client, "traffic_cleaned.parquet", columns=["city", "date_time"]
+        )
+        partitions = pd.DataFrame(
+            {
+                "city": keys["city"],
+                "year": keys["date_time"].dt.year,
+                "month": keys["date_time"].dt.month,
+            }
+        ).drop_duplicates()
+    partitions = partitions.dropna().sort_values(["city", "year", "month"])
+    return [
+        (row.city, pd.Timestamp(year=int(row.year), month=int(row.month), day=1))
+        for row in partitions.itertuples()
+    ]
+
+
+def join_slice(weather_df, traffic_df, tolerance):
+    # Same columns, in the same order, as the hash join
+    columns = pd.merge(weather_df.head(0), traffic_df.head(0), on=MERGE_KEYS).columns
+    if tolerance is None:
+        return pd.merge(weather_df, traffic_df, on=MERGE_KEYS, how="inner")[columns]
+
+    # Nearest weather reading per traffic row; traffic keeps its timestamp
+    weather_df = weather_df.sort_values("date_time").assign(_matched=True)
+    merged = pd.merge_asof(
+        traffic_df.sort_values("date_time"),
+        weather_df,
+        on="date_time",
+        by="city",
+        tolerance=tolerance,
+        direction="nearest",
+        suffixes=("_y", "_x"),
+    )
+    merged = merged[merged["_matched"].notna()]
+    return merged[columns]
+
+
+def merge_sorted(client, tolerance=None):
+    file_name = "merged_analytical_data.parquet"
+    silver_io.remove_dataset(client, file_name)
+    margin = tolerance if tolerance is not None else pd.Timedelta(0)
+
+    rows = 0
+    for city, month_start in merge_slices(client):
+        month_end = month_start + pd.offsets.MonthBegin(1) - pd.Timedelta(1, "ns")
+        traffic_df = silver_io.read_silver(
+            client, "traffic_cleaned.parquet", [city], month_start, month_end
+        )
+        # Weather just outside the month can still be the nearest reading
+        weather_df = silver_io.read_silver(
+            client,
+            "weather_cleaned.parquet",
+            [city],
+            month_start - margin,
+            month_end + margin,
+        )
+        if traffic_df.empty or weather_df.empty:
+            continue
+
+        merged_df = to_merged_frame(join_slice(weather_df, traffic_df, tolerance))
+        if merged_df.empty:
+            continue
+        silver_io.write_silver(client, file_name, merged_df, append=True)
+        rows += len(merged_df)
+        print(f" -> {city} {month_start:%Y-%m}: {len(merged_df)} rows")
+
+    print(f"Merged Dataset Rows: {rows}")
+    print(f"Successfully saved {file_name} to MinIO Silver bucket.")
+
+
+def sql_string(value):
+    # Quoted SQL string literal; SET and CREATE SECRET take no parameters
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def duckdb_connection():
+    # Imported here so the other engines work without duckdb installed
+    import duckdb
+
+    os.makedirs(DUCKDB_TEMP_DIR, exist_ok=True)
+    con = duckdb.connect()
+    con.execute("INSTALL httpfs")
+    con.execute("LOAD httpfs")
+    # A temporary secret rather than s3_* settings: DuckDB redacts secrets
+    # in duckdb_secrets() and they are not readable via current_setting()
+    con.execute(
+        "CREATE TEMPORARY SECRET minio ("
+        "TYPE s3, "
+        f"KEY_ID {sql_string(minio_config.MINIO_ACCESS_KEY)}, "
+        f"SECRET {sql_string(minio_config.MINIO_SECRET_KEY)}, "
+        f"ENDPOINT {sql_string(minio_config.MINIO_ENDPOINT)}, "
+        f"USE_SSL {str(minio_config.MINIO_SECURE).lower()}, "
+        "URL_STYLE 'path')"
     )
+    con.execute(f"SET memory_limit = {sql_string(DUCKDB_MEMORY_LIMIT)}")
+    con.execute(f"SET temp_directory = {sql_string(DUCKDB_TEMP_DIR)}")
+    con.execute(f"SET threads = {int(DUCKDB_THREADS or os.cpu_count())}")
+    return con
+
+
+def duckdb_path(name):
+    return f"s3://{silver_io.SILVER_BUCKET}/{name}"
+
+
+def duckdb_source(client, name):
+    # Parts and partitions under the prefix win over the single file, as in
+    # silver_io.read_silver
+    if silver_io.list_dataset(client, name):
+        path = duckdb_path(silver_io.dataset_prefix(name) + "**/*.parquet")
+        return f"read_parquet({sql_string(path)}, hive_partitioning = true)"
+    return f"read_parquet({sql_string(duckdb_path(name))})"
+
+
+def duckdb_merge_query(con, weather_source, traffic_source):
+    # SELECT list mirroring pd.merge(weather, traffic, on=MERGE_KEYS): weather
+    # columns, then traffic's non-key columns, overlaps suffixed _x / _y so
+    # to_merged_frame can prefix them.
+    def names(source):
+        columns = con.execute(f"SELECT * FROM {source} LIMIT 0").description
+        # year/month only exist as partition path values
+        return [c[0] for c in columns if c[0] not in ("year", "month")]
+
+    weather_columns = names(weather_source)
+    traffic_columns = [c for c in names(traffic_source) if c not in MERGE_KEYS]
+    select = []
+    for column in weather_columns:
+        alias = column
+        if column not in MERGE_KEYS and column in traffic_columns:
+            alias = f"{column}_x"
+        select.append(f'w."{column}" AS "{alias}"')
+    for column in traffic_columns:
+        alias = f"{column}_y" if column in weather_columns else column
+        select.append(f't."{column}" AS "{alias}"')
+
+    # IS NOT DISTINCT FROM matches null keys the way pandas does
+    on = " AND ".join(f'w."{key}" IS NOT DISTINCT FROM t."{key}"' for key in MERGE_KEYS)
+    return (
+        f"SELECT {', '.join(select)} "
+        f"FROM {weather_source} AS w JOIN {traffic_source} AS t ON {on}"
+    )
+
+
+def merge_duckdb(client):
+    file_name = "merged_analytical_data.parquet"
+    con = duckdb_connection()
+    query = duckdb_merge_query(
+        con,
+        duckdb_source(client, "weather_cleaned.parquet"),
+        duckdb_source(client, "traffic_cleaned.parquet"),
+    )
+    silver_io.remove_dataset(client, file_name)
+
+    # Results stream out in row-group sized batches and are cast to
+    # MERGED_SCHEMA on the way, so only one batch is in Python memory.
+    batches = con.execute(query).fetch_record_batch(silver_io.ROW_GROUP_ROWS)
+    rows = 0
+    if silver_io.SILVER_LAYOUT == "partitioned":
+        for batch in batches:
+            merged_df = to_merged_frame(batch.to_pandas())
+            silver_io.write_silver(client, file_name, merged_df, append=True)
+            rows += len(merged_df)
+    else:
+        # One multi-row-group file, staged next to DuckDB's spill files
+        local_path = os.path.join(DUCKDB_TEMP_DIR, file_name)
+        with pq.ParquetWriter(local_path, MERGED_SCHEMA) as writer:
+            for batch in batches:
+                table = to_merged_table(batch.to_pandas())
+                writer.write_table(table)
+                rows += table.num_rows
+        transfer.upload_file(
+            client,
+            silver_io.SILVER_BUCKET,
+            file_name,
+            local_path,
+            content_type="application/x-parquet",
+        )
+        os.remove(local_path)
+    con.close()
 
-    def load_parquet(bucket, filename):
+    print(f"Merged Dataset Rows: {rows}")
+    print(f"Successfully saved {file_name} to MinIO Silver bucket.")
+
+
+def hash_merge(weather_df, traffic_df):
+    return pd.merge(weather_df, traffic_df, on=MERGE_KEYS, how="inner")
+
+
+def parity_mismatch(actual, expected):
+    # None when both frames hold the same merged rows, else what differs. Row
+    # order is not part of the contract, so both sides are sorted first.
+    def canonical(df):
+        # Category order depends on the dictionaries of the files read
+        df = df[sorted(df.columns)]
+        categories = df.select_dtypes("category").columns
+        df = df.astype({column: str for column in categories})
+        return df.sort_values(list(df.columns)).reset_index(drop=True)
+
+    if sorted(actual.columns) != sorted(expected.columns):
+        return (
+            f"Column mismatch: {sorted(actual.columns)} vs {sorted(expected.columns)}"
+        )
+    try:
+        pd.testing.assert_frame_equal(
+            canonical(actual), canonical(expected), check_dtype=False
+        )
+    except AssertionError as e:
+        return f"Row mismatch ({len(actual)} vs {len(expected)} rows): {e}"
+    return None
+
+
+def check_merge_parity(client):
+    # Compares the stored merged dataset with the in-memory pandas join
+    expected = to_merged_frame(
+        hash_merge(
+            silver_io.read_silver(client, "weather_cleaned.parquet"),
+            silver_io.read_silver(client, "traffic_cleaned.parquet"),
+        )
+    )
+    actual = silver_io.read_silver(client, "merged_analytical_data.parquet")
+
+    print("\n--- Merge Parity Check (stored vs pandas) ---")
+    mismatch = parity_mismatch(actual, expected)
+    if mismatch is not None:
+        print(mismatch)
+        return False
+    print(f"Parity OK: {len(actual)} identical rows.")
+    return True
+
+
+def cache_key(client):
+    # Stage cache key for the merge (see stage_cache.py)
+    return stage_cache.stage_key(
+        client,
+        [("silver", "weather_cleaned.parquet"), ("silver", "traffic_cleaned.parquet")],
+        {
+            "engine": MERGE_ENGINE,
+            "tolerance_minutes": MERGE_TOLERANCE_MINUTES,
+            "keys": MERGE_KEYS,
+            "layout": silver_io.SILVER_LAYOUT,
+            "row_group_rows": silver_io.ROW_GROUP_ROWS,
+        },
+        ["merge_data", "merged_schema", "silver_io", "dtype_optimizer"],
+    )
+
+
+def record_merged(client, key):
+    stage_cache.record(
+        client, "merge", key, [("silver", "merged_analytical_data.parquet")]
+    )
+
+
+def merge_datasets(weather_df=None, traffic_df=None, write=True):
+    # The hash engine can take the cleaned frames in memory and returns the
+    # merged frame; write=False leaves the Silver write to the caller. The
+    # other engines always read and write Silver themselves.
+    client = minio_config.get_client()
+
+    # Frames handed over in memory are fresh output, so only a merge that
+    # reads its inputs from Silver can be a cache hit
+    key = None
+    if MERGE_ENGINE != "hash" or (weather_df is None and traffic_df is None):
+        key = cache_key(client)
+        if stage_cache.is_fresh(client, "merge", key):
+            print(
+                "merged_analytical_data.parquet is up to date (stage cache), skipping."
+            )
+            return None
+
+    def load_parquet(filename):
         try:
             print(f"Loading {filename}...")
-            response = client.get_object(bucket, filename)
-            data = io.BytesIO(response.read())
-            response.close()
-            response.release_conn()
-            return pd.read_parquet(data)
+            return silver_io.read_silver(client, filename)
         except Exception as e:
             print(f"Error loading {filename}: {e}")
             return None
 
-    weather_df = load_parquet("silver", "weather_cleaned.parquet")
-    traffic_df = load_parquet("silver", "traffic_cleaned.parquet")
+    if MERGE_ENGINE == "sort_merge":
+        tolerance = None
+        if MERGE_TOLERANCE_MINUTES is not None:
+            tolerance = pd.Timedelta(minutes=MERGE_TOLERANCE_MINUTES)
+        print("Merging datasets slice by slice...")
+        merge_sorted(client, tolerance)
+        if key is not None:
+            record_merged(client, key)
+        return
+
+    if MERGE_ENGINE == "duckdb":
+        print("Merging datasets with DuckDB...")
+        merge_duckdb(client)
+        if CHECK_MERGE_PARITY:
+            check_merge_parity(client)
+        if key is not None:
+            record_merged(client, key)
+        return
+
+    if weather_df is None:
+        weather_df = load_parquet("weather_cleaned.parquet")
+    if traffic_df is None:
+        traffic_df = load_parquet("traffic_cleaned.parquet")
 
     if weather_df is None or traffic_df is None:
         print("Failed to load datasets. Stopping.")
-        return
+        return None
 
     print(f"Loaded Weather Rows: {len(weather_df)}")
     print(f"Loaded Traffic Rows: {len(traffic_df)}")
     print("Merging datasets...")
-    merged_df = pd.merge(weather_df, traffic_df, on=["date_time", "city"], how="inner")
+    joined_df = prefix_collisions(hash_merge(weather_df, traffic_df))
+    merged_df = to_merged_frame(joined_df)
 
     print(f"Merged Dataset Rows: {len(merged_df)}")
 
-    output_buffer = io.BytesIO()
-    merged_df.to_parquet(output_buffer, index=False)
-    output_buffer.seek(0)
-
     file_name = "merged_analytical_data.parquet"
+    print_dtype_report(file_name, joined_df, merged_df)
 
-    client.put_object(
-        "silver",
-        file_name,
-        data=output_buffer,
-        length=output_buffer.getbuffer().nbytes,
-        content_type="application/x-parquet",
-    )
-    print(f"Successfully saved {file_name} to MinIO Silver bucket.")
+    if write:
+        silver_io.write_silver(client, file_name, merged_df)
+        print(f"Successfully saved {file_name} to MinIO Silver bucket.")
+        if key is not None:
+            record_merged(client, key)
+    return merged_df
 
 
 if __name__ == "__main__":
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from dtype_optimizer import checked_astype
+
+# Column contract for merged_analytical_data.parquet. Every merge engine
+# writes exactly these columns and types, so readers need no renames or
+# casts. Columns present in both sources are prefixed with their source.
+# Types are what dtype_optimizer picks for cleaned Silver data (counts and
+# traffic visibility are bounded by the cleaning rules), except the ids:
+# those are int32 so load-test id ranges fit, where a small sample would
+# get int16.
+
+CATEGORY = pa.dictionary(pa.int32(), pa.string())
+
+MERGED_SCHEMA = pa.schema(
+    [
+        ("date_time", pa.timestamp("s")),
+        ("city", CATEGORY),
+        # Weather
+        ("weather_id", pa.int32()),
+        ("season", CATEGORY),
+        ("temperature_c", pa.float32()),
+        ("humidity", pa.float32()),
+        ("rain_mm", pa.float32()),
+        ("wind_speed_kmh", pa.float32()),
+        ("weather_visibility_m", pa.float32()),
+        ("weather_condition", CATEGORY),
+        ("air_pressure_hpa", pa.float32()),
+        # Traffic
+        ("traffic_id", pa.int32()),
+        ("area", CATEGORY),
+        ("vehicle_count", pa.int16()),
+        ("avg_speed_kmh", pa.float32()),
+        ("accident_count", pa.int8()),
+        ("congestion_level", CATEGORY),
+        ("road_condition", CATEGORY),
+        ("traffic_visibility_m", pa.int16()),
+    ]
+)
+
+
+def prefix_collisions(df):
+    # pd.merge marks shared columns "<name>_x" (weather) / "<name>_y" (traffic)
+    renames = {}
+    for column in df.columns:
+        if column.endswith("_x") and f"{column[:-2]}_y" in df.columns:
+            renames[column] = f"weather_{column[:-2]}"
+            renames[f"{column[:-2]}_y"] = f"traffic_{column[:-2]}"
+    return df.rename(columns=renames)
+
+
+def pandas_dtype(field_type):
+    if pa.types.is_dictionary(field_type):
+        return "category"
+    if pa.types.is_timestamp(field_type):
+        return f"datetime64[{field_type.unit}]"
+    return np.dtype(field_type.to_pandas_dtype())
+
+
+def to_merged_frame(df):
+    # Joined weather + traffic rows -> MERGED_SCHEMA column order and dtypes.
+    # Numeric casts are checked: values that don't fit the contract raise
+    # instead of being written wrapped or truncated.
+    df = prefix_collisions(df)
+    return pd.DataFrame(
+        {
+            field.name: checked_astype(df[field.name], pandas_dtype(field.type))
+            for field in MERGED_SCHEMA
+        }
+    )
+
+
+def to_merged_table(df):
+    return pa.Table.from_pandas(
+        to_merged_frame(df), schema=MERGED_SCHEMA, preserve_index=False
+    )
@@ -0,0 +1,56 @@
+import os
+from functools import lru_cache
+import certifi
+import urllib3
+from minio import Minio
+
+# One MinIO client per process for every pipeline stage and the dashboard.
+# Settings come from the environment (defaults match docker-compose.yaml as
+# seen from the host); inside the compose network set
+# MINIO_ENDPOINT=minio:9000. The client is thread-safe and shares one
+# keep-alive connection pool, so parallel transfers and stages reuse
+# connections instead of opening new ones.
+
+
+def env_flag(name, default):
+    return os.environ.get(name, default).strip().lower() in ("1", "true", "yes")
+
+
+MINIO_ENDPOINT = os.environ.get("MINIO_ENDPOINT", "localhost:9000")
+MINIO_ACCESS_KEY = os.environ.get("MINIO_ACCESS_KEY", "admin")
+MINIO_SECRET_KEY = os.environ.get("MINIO_SECRET_KEY", "admin123")
+MINIO_SECURE = env_flag("MINIO_SECURE", "false")
+# Kept-alive connections to the endpoint. Should cover transfer.CONCURRENCY
+# times the number of stages running at once.
+MINIO_POOL_SIZE = int(os.environ.get("MINIO_POOL_SIZE", "32"))
+# Retries for connection errors and 5xx responses, with exponential backoff
+# (MINIO_BACKOFF * 2 ** retry seconds)
+MINIO_RETRIES = int(os.environ.get("MINIO_RETRIES", "5"))
+MINIO_BACKOFF = float(os.environ.get("MINIO_BACKOFF", "0.2"))
+MINIO_CONNECT_TIMEOUT = float(os.environ.get("MINIO_CONNECT_TIMEOUT", "10"))
+MINIO_READ_TIMEOUT = float(os.environ.get("MINIO_READ_TIMEOUT", "300"))
+
+
+def http_client():
+    return urllib3.PoolManager(
+        maxsize=MINIO_POOL_SIZE,
+        timeout=urllib3.Timeout(connect=MINIO_CONNECT_TIMEOUT, read=MINIO_READ_TIMEOUT),
+        retries=urllib3.Retry(
+            total=MINIO_RETRIES,
+            backoff_factor=MINIO_BACKOFF,
+            status_forcelist=[500, 502, 503, 504],
+        ),
+        cert_reqs="CERT_REQUIRED",
+        ca_certs=os.environ.get("SSL_CERT_FILE") or certifi.where(),
+    )
+
+
+@lru_cache(maxsize=None)
+def get_client():
+    return Minio(
+        MINIO_ENDPOINT,
+        access_key=MINIO_ACCESS_KEY,
+        secret_key=MINIO_SECRET_KEY,
+        secure=MINIO_SECURE,
+        http_client=http_client(),
+    )
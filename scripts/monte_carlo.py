@@ -1,64 +1,742 @@
 import pandas as pd
 import numpy as np
 import io
-import matplotlib.pyplot as plt
-from minio import Minio
+import itertools
+import operator
+import os
+import pyarrow as pa
+import pyarrow.parquet as pq
+from concurrent.futures import ProcessPoolExecutor
+from matplotlib.figure import Figure
+import minio_config
+import silver_io
+import stage_cache
 
 # --- Configuration ---
-MINIO_ENDPOINT = "localhost:9000"
-ACCESS_KEY = "admin"
-SECRET_KEY = "admin123"
 SIMULATION_RUNS = 10000
+# Restrict the simulation pool to some cities / a date range (None = all).
+# With the partitioned Silver layout only the matching partitions are read.
+SIMULATION_CITIES = None
+SIMULATION_START = None
+SIMULATION_END = None
+
+# "batched" draws every run as one NumPy pass, "legacy" keeps the original
+# row-by-row loop (slow, kept for statistical cross-checks).
+SIMULATION_ENGINE = "batched"
+# Set to an int for reproducible runs (e.g. when comparing the two engines).
+RANDOM_SEED = None
+# Also run both engines on the same pool and print how far apart they are.
+COMPARE_ENGINES = False
+
+# Streaming mode runs the simulation CHUNK_SIZE runs at a time and only keeps
+# running aggregates, so memory depends on CHUNK_SIZE, not SIMULATION_RUNS.
+STREAMING = False
+CHUNK_SIZE = 1_000_000
+# In streaming mode, also write per-run rows as a partitioned Parquet dataset
+# (gold/simulation_results/part-00000.parquet, ...) instead of one big CSV.
+WRITE_RUN_PARTITIONS = False
+RESULTS_DATASET_PREFIX = "simulation_results"
+# Spread streaming chunks over a process pool. 1 runs in-process, 0 uses every
+# core. Each chunk gets its own SeedSequence child, so a seeded run gives the
+# same aggregates for any worker count.
+PARALLEL_WORKERS = 1
+# Fixed histogram bins for congestion_distribution.png (risk score is 0-10)
+HISTOGRAM_BINS = np.linspace(0, 10, 31)
+
+# --- Severe Weather Filter ---
+# A scenario is "severe" if ANY rule matches: (column, operator, threshold).
+SEVERE_WEATHER_RULES = [
+    ("rain_mm", ">", 5.0),
+    ("wind_speed_kmh", ">", 40.0),
+    ("weather_visibility_m", "<", 2000),
+    ("temperature_c", "<", 2),
+]
+# Push the rules down into the Parquet read so only candidate rows are loaded.
+PUSHDOWN_SEVERE_WEATHER = True
+# Download only the columns the simulation uses (rules, risk inputs, strata).
+PROJECT_COLUMNS = True
+RISK_COLUMNS = [
+    "rain_mm",
+    "wind_speed_kmh",
+    "weather_visibility_m",
+    "congestion_level",
+]
+
+RULE_OPERATORS = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+}
+
+# --- Risk Model Parameters ---
+RAIN_PENALTY_WEIGHT = 0.1
+WIND_PENALTY_WEIGHT = 0.05
+LOW_VISIBILITY_M = 1000
+VISIBILITY_PENALTY = 2.0
+NOISE_STD = 0.5
+JAM_THRESHOLD = 6.0
+ACCIDENT_DIVISOR = 20.0
+
+# --- Scenario Sweep ---
+# Evaluates every combination of SWEEP_GRID on one shared set of random draws
+# (common random numbers) and saves one row per combination to Gold instead
+# of running the normal simulation. Parameters left out of the grid keep the
+# values above.
+SWEEP_MODE = False
+SWEEP_RUNS = 100_000
+SWEEP_GRID = {
+    "rain_penalty_weight": [0.05, 0.1, 0.15],
+    "wind_penalty_weight": [0.05],
+    "visibility_penalty": [2.0],
+    "jam_threshold": [5.0, 6.0, 7.0],
+    "accident_divisor": [20.0],
+}
+# z value for the reported confidence intervals (1.96 = 95%)
+CONFIDENCE_Z = 1.96
+
+# --- Variance Reduction ---
+# Any of "antithetic" (mirrored noise/uniforms on a shared scenario; only pays
+# off when the noise dominates the scenario spread), "stratified" (proportional
+# allocation over STRATA_COLUMNS of the pool) and "control_variate" (Base_Risk,
+# whose pool mean is known exactly). Used by the in-memory batched path.
+VARIANCE_REDUCTION = []
+STRATA_COLUMNS = ["congestion_level", "season"]
+# Adaptive stopping: keep adding ADAPTIVE_BATCH_RUNS until the CI half-width
+# of both prob_jam and prob_accident (in percentage points) is at most this,
+# or MAX_ADAPTIVE_RUNS is reached. None runs exactly SIMULATION_RUNS.
+TARGET_CI_HALF_WIDTH = None
+ADAPTIVE_BATCH_RUNS = 10_000
+MAX_ADAPTIVE_RUNS = 10_000_000
+
+
+def severe_weather_mask(df, rules=SEVERE_WEATHER_RULES):
+    # OR of one vectorized comparison per rule. NaN compares as False, like
+    # the old row-wise check.
+    mask = np.zeros(len(df), dtype=bool)
+    for column, op, threshold in rules:
+        mask |= RULE_OPERATORS[op](df[column].to_numpy(dtype=float), threshold)
+    return mask
+
+
+def severe_weather_filters(schema, rules=SEVERE_WEATHER_RULES):
+    # Same rules as pyarrow DNF filters (a list of OR-ed groups). Returns None
+    # if any rule can't be pushed down, because dropping one OR term would
+    # silently drop rows.
+    filters = []
+    for column, op, threshold in rules:
+        if column not in schema.names:
+            return None
+        field_type = schema.field(column).type
+        if not (pa.types.is_integer(field_type) or pa.types.is_floating(field_type)):
+            return None
+        filters.append([(column, op, threshold)])
+    return filters
+
+
+def simulation_columns(schema, rules=SEVERE_WEATHER_RULES):
+    # Columns to project from the merged file. Optional strata columns are
+    # skipped if absent.
+    wanted = RISK_COLUMNS + [column for column, _, _ in rules] + STRATA_COLUMNS
+    return [
+        column
+        for column in dict.fromkeys(wanted)
+        if column in schema.names or column not in STRATA_COLUMNS
+    ]
+
+
+def simulate_legacy(severe_weather_df, runs, rng, start_id=0):
+    simulation_results = []
+
+    for i in range(start_id, start_id + runs):
+        # A. Sample one weather scenario
+        scenario = severe_weather_df.sample(n=1, replace=True, random_state=rng).iloc[0]
+
+        # B. Calculate Continuous Risk Score (The "Different Bars" Logic)
+        # Formula: Base Congestion + Rain penalty + Wind penalty + Visibility penalty
+        # This adds variance so the bars aren't just 1, 3, or 5.
+
+        weather_penalty = (scenario["rain_mm"] * RAIN_PENALTY_WEIGHT) + (
+            scenario["wind_speed_kmh"] * WIND_PENALTY_WEIGHT
+        )
+
+        if scenario["weather_visibility_m"] < LOW_VISIBILITY_M:
+            weather_penalty += VISIBILITY_PENALTY
+
+        # Add random noise (simulation uncertainty)
+        noise = rng.normal(0, NOISE_STD)
+
+        total_risk_score = scenario["Base_Risk"] + weather_penalty + noise
+
+        # Clip score to be between 0 and 10
+        total_risk_score = max(0, min(10, total_risk_score))
+
+        # C. Probabilistic Accident Simulation (Fixing the "Zeros" issue)
+        # Instead of just reading the old accident_count, we calculate PROBABILITY
+        # Higher risk score = Higher chance of accident in this simulated hour
+
+        accident_probability = total_risk_score / ACCIDENT_DIVISOR
+        is_accident = rng.random() < accident_probability
+
+        # D. Traffic Jam Logic
+        is_jam = total_risk_score > JAM_THRESHOLD  # Threshold for "Jam"
+
+        simulation_results.append(
+            {
+                "run_id": i,
+                "is_traffic_jam": is_jam,
+                "is_accident": is_accident,
+                "risk_score": total_risk_score,
+            }
+        )
+
+    return pd.DataFrame(simulation_results)
+
+
+def risk_params():
+    return {
+        "rain_penalty_weight": RAIN_PENALTY_WEIGHT,
+        "wind_penalty_weight": WIND_PENALTY_WEIGHT,
+        "low_visibility_m": LOW_VISIBILITY_M,
+        "visibility_penalty": VISIBILITY_PENALTY,
+        "noise_std": NOISE_STD,
+        "jam_threshold": JAM_THRESHOLD,
+        "accident_divisor": ACCIDENT_DIVISOR,
+    }
+
+
+def pool_arrays(severe_weather_df):
+    return {
+        "rain": severe_weather_df["rain_mm"].to_numpy(dtype=float),
+        "wind": severe_weather_df["wind_speed_kmh"].to_numpy(dtype=float),
+        "visibility": severe_weather_df["weather_visibility_m"].to_numpy(dtype=float),
+        "base_risk": severe_weather_df["Base_Risk"].to_numpy(dtype=float),
+    }
+
+
+def draw_runs(pool_size, runs, rng):
+    # Every random number a batch of runs needs. Noise is drawn as a standard
+    # normal and scaled later, so one set of draws can serve any noise_std.
+    return {
+        "idx": rng.integers(0, pool_size, size=runs),
+        "noise": rng.standard_normal(runs),
+        "uniform": rng.random(runs),
+    }
+
+
+def score_runs(pool, draws, params):
+    idx = draws["idx"]
+
+    # Continuous risk score
+    weather_penalty = (
+        pool["rain"][idx] * params["rain_penalty_weight"]
+        + pool["wind"][idx] * params["wind_penalty_weight"]
+    )
+    weather_penalty += np.where(
+        pool["visibility"][idx] < params["low_visibility_m"],
+        params["visibility_penalty"],
+        0.0,
+    )
+    noise = draws["noise"] * params["noise_std"]
+    risk_score = np.clip(pool["base_risk"][idx] + weather_penalty + noise, 0, 10)
+
+    # Accident and jam flags
+    is_accident = draws["uniform"] < risk_score / params["accident_divisor"]
+    is_jam = risk_score > params["jam_threshold"]
+    return risk_score, is_jam, is_accident
+
+
+def simulate_batched(severe_weather_df, runs, rng, start_id=0):
+    # Same model as simulate_legacy, but every draw is made up front as an
+    # array so the whole simulation is a handful of NumPy operations.
+    draws = draw_runs(len(severe_weather_df), runs, rng)
+    risk_score, is_jam, is_accident = score_runs(
+        pool_arrays(severe_weather_df), draws, risk_params()
+    )
+
+    return pd.DataFrame(
+        {
+            "run_id": np.arange(start_id, start_id + runs),
+            "is_traffic_jam": is_jam,
+            "is_accident": is_accident,
+            "risk_score": risk_score,
+        }
+    )
+
+
+def mean_with_ci(name, values, scale=1.0):
+    values = values.astype(float)
+    mean = values.mean()
+    half_width = CONFIDENCE_Z * values.std(ddof=1) / np.sqrt(len(values))
+    return {
+        name: mean * scale,
+        f"{name}_ci_low": (mean - half_width) * scale,
+        f"{name}_ci_high": (mean + half_width) * scale,
+    }
+
+
+def stratify_pool(severe_weather_df, methods):
+    # Stratum code per pool row plus each stratum's share of the pool and its
+    # exact Base_Risk mean (the control variate's known expectation).
+    strata_columns = [c for c in STRATA_COLUMNS if c in severe_weather_df.columns]
+    if "stratified" in methods and strata_columns:
+        codes = (
+            severe_weather_df.groupby(strata_columns, dropna=False, observed=True)
+            .ngroup()
+            .to_numpy()
+        )
+    else:
+        codes = np.zeros(len(severe_weather_df), dtype=np.int64)
+
+    counts = np.bincount(codes)
+    base_risk_means = (
+        np.bincount(codes, weights=severe_weather_df["Base_Risk"].to_numpy(float))
+        / counts
+    )
+    return codes, counts / counts.sum(), base_risk_means
+
+
+def draw_runs_reduced(strata, runs, rng, methods):
+    codes, weights, _ = strata
+    antithetic = "antithetic" in methods
+    base_runs = runs // 2 if antithetic else runs
+
+    # Proportional allocation of runs to strata (largest remainder rounding)
+    quota = weights * base_runs
+    allocation = np.floor(quota).astype(np.int64)
+    shortfall = base_runs - allocation.sum()
+    allocation[np.argsort(allocation - quota)[:shortfall]] += 1
+
+    # Sample pool rows uniformly within each stratum
+    order = np.argsort(codes, kind="stable")
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(codes))[:-1]])
+    stratum = np.repeat(np.arange(len(weights)), allocation)
+    sizes = np.bincount(codes)[stratum]
+    idx = order[offsets[stratum] + rng.integers(0, sizes)]
+
+    noise = rng.standard_normal(base_runs)
+    uniform = rng.random(base_runs)
+
+    if antithetic:
+        # Run i and run i + base_runs share a scenario with mirrored draws
+        idx = np.concatenate([idx, idx])
+        stratum = np.concatenate([stratum, stratum])
+        noise = np.concatenate([noise, -noise])
+        uniform = np.concatenate([uniform, 1.0 - uniform])
+
+    return {"idx": idx, "noise": noise, "uniform": uniform, "stratum": stratum}
+
+
+def reduced_estimate(values, draws, strata, pool, methods):
+    # Estimate of E[values] and its CI half-width under the chosen methods.
+    _, weights, base_risk_means = strata
+    y = values.astype(float)
+    x = pool["base_risk"][draws["idx"]]
+    stratum = draws["stratum"]
+
+    if "antithetic" in methods:
+        # Each mirrored pair is one independent sample
+        half = len(y) // 2
+        y = (y[:half] + y[half:]) / 2
+        x = (x[:half] + x[half:]) / 2
+        stratum = stratum[:half]
+
+    if "control_variate" in methods:
+        x_centered = x - base_risk_means[stratum]
+        y_centered = (
+            y - (np.bincount(stratum, weights=y) / np.bincount(stratum))[stratum]
+        )
+        x_var = np.square(x_centered).sum()
+        beta = (x_centered * y_centered).sum() / x_var if x_var > 0 else 0.0
+        y = y - beta * x_centered
+
+    # Stratified mean and variance (one stratum when not stratified)
+    n = np.bincount(stratum, minlength=len(weights))
+    sampled = n > 0
+    means = np.bincount(stratum, weights=y, minlength=len(weights))[sampled]
+    means = means / n[sampled]
+    sq_dev = np.square(
+        y - (np.bincount(stratum, weights=y) / np.maximum(n, 1))[stratum]
+    )
+    variances = np.bincount(stratum, weights=sq_dev, minlength=len(weights))[sampled]
+    variances = variances / np.maximum(n[sampled] - 1, 1)
+
+    w = weights[sampled] / weights[sampled].sum()
+    mean = (w * means).sum()
+    std_err = np.sqrt((np.square(w) * variances / n[sampled]).sum())
+    return float(mean), float(CONFIDENCE_Z * std_err)
+
+
+def concat_batches(batches, antithetic):
+    if not antithetic:
+        return {k: np.concatenate([b[k] for b in batches]) for k in batches[0]}
+    # Keep mirrored pairs aligned: all first halves, then all second halves
+    return {
+        k: np.concatenate(
+            [b[k][: len(b[k]) // 2] for b in batches]
+            + [b[k][len(b[k]) // 2 :] for b in batches]
+        )
+        for k in batches[0]
+    }
+
+
+def run_variance_reduced(severe_weather_df, runs, rng, methods, target=None):
+    # Batched simulation with variance reduction. With a target half-width the
+    # run count doubles (starting at ADAPTIVE_BATCH_RUNS) until both
+    # probabilities are precise enough; otherwise exactly `runs` runs are made.
+    pool = pool_arrays(severe_weather_df)
+    strata = stratify_pool(severe_weather_df, methods)
+    params = risk_params()
+    antithetic = "antithetic" in methods
+
+    batch_runs = ADAPTIVE_BATCH_RUNS if target is not None else runs
+    max_runs = MAX_ADAPTIVE_RUNS if target is not None else runs
+    batches = []
+    total_runs = 0
+
+    while True:
+        batch = draw_runs_reduced(strata, batch_runs, rng, methods)
+        batch["risk_score"], batch["is_jam"], batch["is_accident"] = score_runs(
+            pool, batch, params
+        )
+        batches.append(batch)
+        total_runs += len(batch["idx"])
+
+        draws = concat_batches(batches, antithetic)
+        estimates = {
+            name: reduced_estimate(draws[key], draws, strata, pool, methods)
+            for name, key in [
+                ("avg_risk", "risk_score"),
+                ("prob_jam", "is_jam"),
+                ("prob_accident", "is_accident"),
+            ]
+        }
+
+        if target is None or total_runs >= max_runs:
+            break
+        worst = max(estimates["prob_jam"][1], estimates["prob_accident"][1]) * 100
+        print(f" -> {total_runs} runs, CI half-width {worst:.3f} pp")
+        if worst <= target:
+            break
+        batch_runs = min(total_runs, max_runs - total_runs)
+
+    results_df = pd.DataFrame(
+        {
+            "run_id": np.arange(total_runs),
+            "is_traffic_jam": draws["is_jam"],
+            "is_accident": draws["is_accident"],
+            "risk_score": draws["risk_score"],
+        }
+    )
+    return results_df, estimates
+
+
+def run_sweep(severe_weather_df, runs, grid, rng):
+    # Draw once, score every combination against the same draws, so
+    # differences between rows come from the parameters, not from noise.
+    pool = pool_arrays(severe_weather_df)
+    draws = draw_runs(len(severe_weather_df), runs, rng)
+    base_params = risk_params()
+
+    sweep_results = []
+    for values in itertools.product(*grid.values()):
+        params = {**base_params, **dict(zip(grid, values))}
+        risk_score, is_jam, is_accident = score_runs(pool, draws, params)
+        sweep_results.append(
+            {
+                **params,
+                "runs": runs,
+                **mean_with_ci("avg_risk", risk_score),
+                **mean_with_ci("prob_jam", is_jam, scale=100),
+                **mean_with_ci("prob_accident", is_accident, scale=100),
+            }
+        )
+
+    return pd.DataFrame(sweep_results)
+
+
+SIMULATION_ENGINES = {
+    "batched": simulate_batched,
+    "legacy": simulate_legacy,
+}
+
+
+def compare_engines(severe_weather_df, runs=SIMULATION_RUNS, seed=0):
+    # Runs both engines on the same pool and prints the difference of each
+    # estimate in standard errors. |z| well above 3 means the engines disagree.
+    summaries = {}
+    for name, engine in SIMULATION_ENGINES.items():
+        results_df = engine(severe_weather_df, runs, np.random.default_rng(seed))
+        summaries[name] = results_df[["is_traffic_jam", "is_accident", "risk_score"]]
+
+    print("\n--- Engine Comparison (batched vs legacy) ---")
+    for column in ["is_traffic_jam", "is_accident", "risk_score"]:
+        a = summaries["batched"][column].astype(float)
+        b = summaries["legacy"][column].astype(float)
+        std_err = np.sqrt(a.var() / len(a) + b.var() / len(b))
+        z = (a.mean() - b.mean()) / std_err if std_err > 0 else 0.0
+        print(f"{column:<15} batched={a.mean():.4f} legacy={b.mean():.4f} z={z:+.2f}")
+
+
+def new_aggregate():
+    return {
+        "runs": 0,
+        "risk_sum": 0.0,
+        "risk_sq_sum": 0.0,
+        "jam_count": 0,
+        "accident_count": 0,
+        "histogram": np.zeros(len(HISTOGRAM_BINS) - 1, dtype=np.int64),
+    }
+
+
+def update_aggregate(aggregate, results_df):
+    risk_score = results_df["risk_score"].to_numpy(dtype=float)
+    aggregate["runs"] += len(results_df)
+    aggregate["risk_sum"] += risk_score.sum()
+    aggregate["risk_sq_sum"] += np.square(risk_score).sum()
+    aggregate["jam_count"] += int(results_df["is_traffic_jam"].sum())
+    aggregate["accident_count"] += int(results_df["is_accident"].sum())
+    aggregate["histogram"] += np.histogram(risk_score, bins=HISTOGRAM_BINS)[0]
+    return aggregate
+
+
+def merge_aggregates(left, right):
+    merged = new_aggregate()
+    for key in merged:
+        merged[key] = left[key] + right[key]
+    return merged
+
+
+def summarize_aggregate(aggregate):
+    runs = aggregate["runs"]
+    return {
+        "runs": runs,
+        "avg_risk": float(aggregate["risk_sum"]) / runs,
+        "prob_jam": aggregate["jam_count"] / runs * 100,
+        "prob_accident": aggregate["accident_count"] / runs * 100,
+    }
+
+
+def write_results_partition(client, results_df, part):
+    silver_io.put_parquet(
+        client,
+        f"{RESULTS_DATASET_PREFIX}/part-{part:05d}.parquet",
+        results_df,
+        bucket="gold",
+    )
+
+
+def remove_results_partitions(client):
+    # Parts of an earlier run; one with more chunks would otherwise leave its
+    # higher-numbered parts mixed into this run's dataset
+    objects = client.list_objects(
+        "gold", prefix=f"{RESULTS_DATASET_PREFIX}/", recursive=True
+    )
+    for obj in objects:
+        client.remove_object("gold", obj.object_name)
+
+
+def plan_chunks(runs, chunk_size, seed):
+    # One independent RNG stream per chunk (not per worker): the streams only
+    # depend on the seed and the chunk layout, never on scheduling.
+    starts = range(0, runs, chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(starts))
+    return [
+        (part, start_id, min(chunk_size, runs - start_id), chunk_seed)
+        for part, (start_id, chunk_seed) in enumerate(zip(starts, seeds))
+    ]
+
+
+def simulate_chunk(severe_weather_df, chunk, engine_name, client=None):
+    part, start_id, chunk_runs, chunk_seed = chunk
+    rng = np.random.default_rng(chunk_seed)
+    chunk_df = SIMULATION_ENGINES[engine_name](
+        severe_weather_df, chunk_runs, rng, start_id=start_id
+    )
+
+    if client is not None:
+        write_results_partition(client, chunk_df, part)
 
+    return update_aggregate(new_aggregate(), chunk_df)
 
-def run_monte_carlo():
+
+# Per-process state for the worker pool, set once by init_worker so the pool
+# DataFrame is pickled once per worker instead of once per chunk.
+_worker_state = {}
+
+
+def init_worker(severe_weather_df, engine_name, write_partitions):
+    _worker_state["pool"] = severe_weather_df
+    _worker_state["engine"] = engine_name
+    _worker_state["client"] = minio_config.get_client() if write_partitions else None
+
+
+def simulate_chunk_in_worker(chunk):
+    return simulate_chunk(
+        _worker_state["pool"],
+        chunk,
+        _worker_state["engine"],
+        client=_worker_state["client"],
+    )
+
+
+def merge_chunk_results(chunks, partials, runs):
+    aggregate = new_aggregate()
+    for (part, start_id, chunk_runs, _), partial in zip(chunks, partials):
+        aggregate = merge_aggregates(aggregate, partial)
+        print(f" -> Chunk {part}: {start_id + chunk_runs}/{runs} runs done")
+    return aggregate
+
+
+def run_chunked(severe_weather_df, runs, chunk_size, seed=None, client=None, workers=1):
+    # Only one chunk of per-run rows is alive per process at a time; everything
+    # else is folded into the running aggregate. Partial aggregates are merged
+    # in chunk order, so the float sums are identical for any worker count.
+    chunks = plan_chunks(runs, chunk_size, seed)
+
+    if workers == 0:
+        workers = os.cpu_count()
+
+    if workers == 1:
+        partials = (
+            simulate_chunk(severe_weather_df, chunk, SIMULATION_ENGINE, client)
+            for chunk in chunks
+        )
+        return merge_chunk_results(chunks, partials, runs)
+
+    # Only the columns the model needs are shipped to the workers.
+    pool_columns = ["rain_mm", "wind_speed_kmh", "weather_visibility_m", "Base_Risk"]
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=init_worker,
+        initargs=(
+            severe_weather_df[pool_columns],
+            SIMULATION_ENGINE,
+            client is not None,
+        ),
+    ) as executor:
+        partials = executor.map(simulate_chunk_in_worker, chunks)
+        return merge_chunk_results(chunks, partials, runs)
+
+
+def cache_key(client):
+    # Stage cache key for the simulation (see stage_cache.py)
+    return stage_cache.stage_key(
+        client,
+        [("silver", "merged_analytical_data.parquet")],
+        {
+            "runs": SIMULATION_RUNS,
+            "cities": SIMULATION_CITIES,
+            "start": SIMULATION_START,
+            "end": SIMULATION_END,
+            "engine": SIMULATION_ENGINE,
+            "seed": RANDOM_SEED,
+            "streaming": STREAMING,
+            "chunk_size": CHUNK_SIZE,
+            "write_run_partitions": WRITE_RUN_PARTITIONS,
+            "severe_weather_rules": SEVERE_WEATHER_RULES,
+            "penalties": [
+                RAIN_PENALTY_WEIGHT,
+                WIND_PENALTY_WEIGHT,
+                LOW_VISIBILITY_M,
+                VISIBILITY_PENALTY,
+                NOISE_STD,
+                JAM_THRESHOLD,
+                ACCIDENT_DIVISOR,
+            ],
+            "sweep": [SWEEP_MODE, SWEEP_RUNS, SWEEP_GRID],
+            "variance_reduction": [VARIANCE_REDUCTION, STRATA_COLUMNS],
+            "adaptive": [TARGET_CI_HALF_WIDTH, ADAPTIVE_BATCH_RUNS, MAX_ADAPTIVE_RUNS],
+        },
+        ["monte_carlo", "silver_io"],
+    )
+
+
+def gold_outputs():
+    # Gold objects a run writes with the current configuration
+    if SWEEP_MODE:
+        return [("gold", "simulation_sweep.csv")]
+    outputs = [
+        ("gold", "simulation_summary.csv"),
+        ("gold", "congestion_distribution.png"),
+    ]
+    if not STREAMING:
+        outputs.append(("gold", "simulation_results.csv"))
+    if STREAMING and WRITE_RUN_PARTITIONS:
+        outputs.append(("gold", RESULTS_DATASET_PREFIX))
+    return outputs
+
+
+def record_outputs(client, key):
+    if key is not None:
+        stage_cache.record(client, "monte_carlo", key, gold_outputs())
+
+
+def run_monte_carlo(merged_df=None):
+    # merged_df: the merged dataset already in memory (e.g. handed over by
+    # pipeline.py); otherwise it is read from Silver.
     print("--- Phase 5: Monte Carlo Simulation (Traffic Risk Prediction) ---")
 
     # 1. Connect to MinIO
-    client = Minio(
-        MINIO_ENDPOINT, access_key=ACCESS_KEY, secret_key=SECRET_KEY, secure=False
-    )
+    client = minio_config.get_client()
+
+    # A dataset handed over in memory is fresh output, so only a run on the
+    # Silver dataset can be a cache hit
+    key = None
+    if merged_df is None:
+        key = cache_key(client)
+        if stage_cache.is_fresh(client, "monte_carlo", key):
+            print("Gold simulation outputs are up to date (stage cache), skipping.")
+            return None
 
     # 2. Load Merged Analytical Dataset
     try:
-        response = client.get_object("silver", "merged_analytical_data.parquet")
-        data = io.BytesIO(response.read())
-        df = pd.read_parquet(data)
-        response.close()
-        response.release_conn()
+        dataset = "merged_analytical_data.parquet"
+        scope = dict(
+            cities=SIMULATION_CITIES, start=SIMULATION_START, end=SIMULATION_END
+        )
+
+        if merged_df is not None:
+            schema = pa.Schema.from_pandas(merged_df, preserve_index=False)
+        else:
+            schema = silver_io.read_silver_schema(client, dataset)
+        if PROJECT_COLUMNS:
+            scope["columns"] = simulation_columns(schema)
+
+        if merged_df is not None:
+            df = silver_io.filter_rows(merged_df, **scope)
+        else:
+            filters = None
+            if PUSHDOWN_SEVERE_WEATHER:
+                filters = severe_weather_filters(schema)
+            df = silver_io.read_silver(client, dataset, filters=filters, **scope)
+
+            if filters is not None and df.empty:
+                # Keep the "no severe weather -> full dataset" fallback below working
+                df = silver_io.read_silver(client, dataset, **scope)
+            elif filters is not None:
+                print("Severe weather filter pushed down into the Parquet read.")
         print(f"Loaded dataset with {len(df)} records.")
     except Exception as e:
         print(f"Error loading merged data: {e}")
         return
 
-    # --- FIX 1: Rename Column if needed ---
-    if "visibility_m_x" in df.columns:
-        df.rename(columns={"visibility_m_x": "visibility_m"}, inplace=True)
-
     # --- FIX 2: Ensure Numeric Data ---
     # Convert 'rain_mm' and 'wind_speed' to numeric, forcing errors to 0
     df["rain_mm"] = pd.to_numeric(df["rain_mm"], errors="coerce").fillna(0)
     df["wind_speed_kmh"] = pd.to_numeric(df["wind_speed_kmh"], errors="coerce").fillna(
         0
     )
-    df["visibility_m"] = pd.to_numeric(df["visibility_m"], errors="coerce").fillna(
-        10000
-    )
+    df["weather_visibility_m"] = pd.to_numeric(
+        df["weather_visibility_m"], errors="coerce"
+    ).fillna(10000)
 
     # 3. Define Base Risk from Congestion
     risk_mapping = {"Low": 1.0, "Medium": 3.0, "High": 5.0}
-    df["Base_Risk"] = df["congestion_level"].map(risk_mapping).fillna(1.0)
+    df["Base_Risk"] = df["congestion_level"].map(risk_mapping).astype(float).fillna(1.0)
 
     # [cite_start]4. Filter for "Bad Weather" Scenarios [cite: 144-148]
-    def is_severe_weather(row):
-        return (
-            (row["rain_mm"] > 5.0)
-            or (row["wind_speed_kmh"] > 40.0)
-            or (row["visibility_m"] < 2000)
-            or (row["temperature_c"] < 2)
-        )
-
-    severe_weather_df = df[df.apply(is_severe_weather, axis=1)].copy()
+    severe_weather_df = df[severe_weather_mask(df)].copy()
 
     if severe_weather_df.empty:
         print("Warning: No severe weather data found. Using full dataset.")
@@ -68,103 +746,154 @@ def run_monte_carlo():
             f"Simulation pool size (Severe Weather Only): {len(severe_weather_df)} records."
         )
 
-    # 5. Run Monte Carlo Simulation
-    print(f"Running {SIMULATION_RUNS} simulation runs...")
-
-    simulation_results = []
-
-    for i in range(SIMULATION_RUNS):
-        # A. Sample one weather scenario
-        scenario = severe_weather_df.sample(n=1, replace=True).iloc[0]
-
-        # B. Calculate Continuous Risk Score (The "Different Bars" Logic)
-        # Formula: Base Congestion + Rain penalty + Wind penalty + Visibility penalty
-        # This adds variance so the bars aren't just 1, 3, or 5.
-
-        weather_penalty = (scenario["rain_mm"] * 0.1) + (
-            scenario["wind_speed_kmh"] * 0.05
+    if SWEEP_MODE:
+        combinations = int(np.prod([len(v) for v in SWEEP_GRID.values()]))
+        print(f"Sweeping {combinations} parameter combinations x {SWEEP_RUNS} runs...")
+        sweep_df = run_sweep(
+            severe_weather_df,
+            SWEEP_RUNS,
+            SWEEP_GRID,
+            np.random.default_rng(RANDOM_SEED),
         )
+        print(sweep_df[list(SWEEP_GRID) + ["avg_risk", "prob_jam", "prob_accident"]])
+
+        csv_buffer = io.BytesIO()
+        sweep_df.to_csv(csv_buffer, index=False)
+        csv_buffer.seek(0)
+        client.put_object(
+            "gold",
+            "simulation_sweep.csv",
+            csv_buffer,
+            csv_buffer.getbuffer().nbytes,
+            content_type="text/csv",
+        )
+        print(" -> Saved simulation_sweep.csv to Gold")
+        record_outputs(client, key)
+        return sweep_df
 
-        if scenario["visibility_m"] < 1000:
-            weather_penalty += 2.0
-
-        # Add random noise (simulation uncertainty)
-        noise = np.random.normal(0, 0.5)
-
-        total_risk_score = scenario["Base_Risk"] + weather_penalty + noise
-
-        # Clip score to be between 0 and 10
-        total_risk_score = max(0, min(10, total_risk_score))
-
-        # C. Probabilistic Accident Simulation (Fixing the "Zeros" issue)
-        # Instead of just reading the old accident_count, we calculate PROBABILITY
-        # Higher risk score = Higher chance of accident in this simulated hour
-
-        accident_probability = total_risk_score / 20.0  # e.g., Score 8 = 40% chance
-        is_accident = np.random.random() < accident_probability
+    # 5. Run Monte Carlo Simulation
+    print(f"Running {SIMULATION_RUNS} simulation runs ({SIMULATION_ENGINE} engine)...")
 
-        # D. Traffic Jam Logic
-        is_jam = total_risk_score > 6.0  # Threshold for "Jam"
+    results_df = None
+    estimates = None
+    remove_results_partitions(client)
 
-        simulation_results.append(
-            {
-                "run_id": i,
-                "is_traffic_jam": is_jam,
-                "is_accident": is_accident,
-                "risk_score": total_risk_score,
-            }
+    if STREAMING:
+        print(
+            f"Streaming mode: {CHUNK_SIZE} runs per chunk, "
+            f"{PARALLEL_WORKERS or os.cpu_count()} worker(s)."
+        )
+        aggregate = run_chunked(
+            severe_weather_df,
+            SIMULATION_RUNS,
+            CHUNK_SIZE,
+            seed=RANDOM_SEED,
+            client=client if WRITE_RUN_PARTITIONS else None,
+            workers=PARALLEL_WORKERS,
+        )
+    elif VARIANCE_REDUCTION or TARGET_CI_HALF_WIDTH is not None:
+        print(f"Variance reduction: {', '.join(VARIANCE_REDUCTION) or 'none'}")
+        results_df, estimates = run_variance_reduced(
+            severe_weather_df,
+            SIMULATION_RUNS,
+            np.random.default_rng(RANDOM_SEED),
+            VARIANCE_REDUCTION,
+            target=TARGET_CI_HALF_WIDTH,
+        )
+        aggregate = update_aggregate(new_aggregate(), results_df)
+    else:
+        rng = np.random.default_rng(RANDOM_SEED)
+        results_df = SIMULATION_ENGINES[SIMULATION_ENGINE](
+            severe_weather_df, SIMULATION_RUNS, rng
         )
+        aggregate = update_aggregate(new_aggregate(), results_df)
 
-    results_df = pd.DataFrame(simulation_results)
+    if COMPARE_ENGINES:
+        compare_engines(
+            severe_weather_df, seed=RANDOM_SEED if RANDOM_SEED is not None else 0
+        )
 
     # [cite_start]6. Calculate Probabilities [cite: 150-153]
-    prob_jam = results_df["is_traffic_jam"].mean() * 100
-    prob_accident = results_df["is_accident"].mean() * 100
-    avg_risk = results_df["risk_score"].mean()
+    summary = summarize_aggregate(aggregate)
+    if estimates is not None:
+        # Variance-reduced estimators replace the plain sample means
+        summary["avg_risk"] = estimates["avg_risk"][0]
+        summary["prob_jam"] = estimates["prob_jam"][0] * 100
+        summary["prob_accident"] = estimates["prob_accident"][0] * 100
+        summary["variance_reduction"] = "+".join(VARIANCE_REDUCTION) or "none"
+        summary["avg_risk_ci"] = estimates["avg_risk"][1]
+        summary["prob_jam_ci"] = estimates["prob_jam"][1] * 100
+        summary["prob_accident_ci"] = estimates["prob_accident"][1] * 100
+    avg_risk = summary["avg_risk"]
 
     print("\n--- Simulation Results ---")
     print(f"Average Risk Score (0-10): {avg_risk:.2f}")
-    print(f"Probability of Traffic Jam: {prob_jam:.2f}%")
-    print(f"Probability of Accident:    {prob_accident:.2f}%")
+    print(f"Probability of Traffic Jam: {summary['prob_jam']:.2f}%")
+    print(f"Probability of Accident:    {summary['prob_accident']:.2f}%")
+    if estimates is not None:
+        print(
+            f"CI half-widths ({summary['runs']} runs): "
+            f"risk ±{summary['avg_risk_ci']:.3f}, "
+            f"jam ±{summary['prob_jam_ci']:.2f} pp, "
+            f"accident ±{summary['prob_accident_ci']:.2f} pp"
+        )
 
     # [cite_start]7. Save Deliverables to Gold [cite: 156-157]
 
-    # A. CSV
-    csv_buffer = io.BytesIO()
-    results_df.to_csv(csv_buffer, index=False)
-    csv_buffer.seek(0)
-    client.put_object(
-        "gold",
-        "simulation_results.csv",
-        csv_buffer,
-        csv_buffer.getbuffer().nbytes,
-        content_type="text/csv",
-    )
-    print(" -> Saved simulation_results.csv to Gold")
+    # A. Summary CSV (the dashboard's KPIs), plus the per-run rows unless
+    # streaming. A streaming run removes the per-run CSV of an earlier run,
+    # so it is never shown next to this run's summary.
+    csv_files = {"simulation_summary.csv": pd.DataFrame([summary])}
+    if results_df is not None:
+        csv_files["simulation_results.csv"] = results_df
+    else:
+        client.remove_object("gold", "simulation_results.csv")
+    for csv_name, csv_df in csv_files.items():
+        csv_buffer = io.BytesIO()
+        csv_df.to_csv(csv_buffer, index=False)
+        csv_buffer.seek(0)
+        client.put_object(
+            "gold",
+            csv_name,
+            csv_buffer,
+            csv_buffer.getbuffer().nbytes,
+            content_type="text/csv",
+        )
+        print(f" -> Saved {csv_name} to Gold")
+    if STREAMING and WRITE_RUN_PARTITIONS:
+        print(f" -> Saved per-run rows to gold/{RESULTS_DATASET_PREFIX}/")
 
     # B. Plot (Now with a nice distribution)
-    plt.figure(figsize=(10, 6))
-
-    # Histogram with more bins for better detail
-    plt.hist(
-        results_df["risk_score"], bins=30, color="#ff9999", edgecolor="black", alpha=0.7
+    # A standalone Figure (no pyplot state), so plotting is safe while other
+    # pipeline stages plot in parallel threads
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
+
+    # Histogram from the fixed-bin counts, so it works for any number of runs
+    ax.hist(
+        HISTOGRAM_BINS[:-1],
+        bins=HISTOGRAM_BINS,
+        weights=aggregate["histogram"],
+        color="#ff9999",
+        edgecolor="black",
+        alpha=0.7,
     )
 
-    plt.axvline(
+    ax.axvline(
         avg_risk,
         color="red",
         linestyle="dashed",
         linewidth=1,
         label=f"Avg Risk: {avg_risk:.1f}",
     )
-    plt.title("Distribution of Traffic Risk Scores (Monte Carlo Simulation)")
-    plt.xlabel("Calculated Risk Score (0=Safe, 10=Extreme Danger)")
-    plt.ylabel("Frequency (Simulated Runs)")
-    plt.legend()
-    plt.grid(axis="y", alpha=0.5)
+    ax.set_title("Distribution of Traffic Risk Scores (Monte Carlo Simulation)")
+    ax.set_xlabel("Calculated Risk Score (0=Safe, 10=Extreme Danger)")
+    ax.set_ylabel("Frequency (Simulated Runs)")
+    ax.legend()
+    ax.grid(axis="y", alpha=0.5)
 
     img_buffer = io.BytesIO()
-    plt.savefig(img_buffer, format="png")
+    fig.savefig(img_buffer, format="png")
     img_buffer.seek(0)
     client.put_object(
         "gold",
@@ -174,6 +903,8 @@ def run_monte_carlo():
         content_type="image/png",
     )
     print(" -> Saved congestion_distribution.png to Gold")
+    record_outputs(client, key)
+    return summary
 
 
 if __name__ == "__main__":
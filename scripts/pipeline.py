@@ -0,0 +1,265 @@
+import os
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pyarrow as pa
+import minio_config
+import silver_io
+import stage_cache
+
+# In-process runner for the whole pipeline (the same phases as run_all.ps1).
+# Stages form a DAG and run on one thread pool as soon as their inputs are
+# ready: weather and traffic are cleaned side by side, cleaned and merged
+# data is handed to the next stage as Arrow tables instead of being read
+# back from MinIO, Silver writes run in the background next to the stages
+# that consume the same data, and both analytics jobs run at once.
+
+RUN_GENERATORS = True
+RUN_BRONZE = True
+# "docker": run hdfs_sync.py in a container on the compose network (HDFS is
+# only reachable there), "local": run it in this process, None: skip
+HDFS_SYNC_MODE = "docker"
+DOCKER_NETWORK = "finalbigdataproject_default"
+MAX_WORKERS = 8
+# How tables are handed between stages: "memory" passes the Arrow table
+# itself; "feather" writes it to HANDOFF_DIR as an uncompressed Feather (Arrow
+# IPC) file and passes a memory-mapped view of it, so the producer's copy is
+# freed and consumers page the data in from the OS cache.
+HANDOFF = "memory"
+HANDOFF_DIR = os.path.join(tempfile.gettempdir(), "pipeline_handoff")
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class Pipeline:
+    def __init__(self):
+        # name -> (func, dependency names); insertion order is the run order
+        self.stages = {}
+        self.timings = {}
+
+    def add(self, name, func, deps=()):
+        # func gets the results of its dependencies, in order
+        missing = [dep for dep in deps if dep not in self.stages]
+        if missing:
+            raise ValueError(f"Stage {name} depends on unknown stages {missing}")
+        self.stages[name] = (func, tuple(deps))
+
+    def run_stage(self, name, func, dep_futures):
+        # A failed dependency raises here, so everything downstream is skipped
+        inputs = [future.result() for future in dep_futures]
+        start = time.perf_counter()
+        print(f"[pipeline] {name} started")
+        try:
+            return func(*inputs)
+        finally:
+            self.timings[name] = time.perf_counter() - start
+            print(f"[pipeline] {name} finished in {self.timings[name]:.2f}s")
+
+    def run(self, max_workers=MAX_WORKERS):
+        # Stages are submitted in insertion order, which lists every stage
+        # after its dependencies. A waiting stage's dependencies have then
+        # always been picked up by a worker before it, so a small pool can't
+        # deadlock.
+        futures = {}
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            for name, (func, deps) in self.stages.items():
+                futures[name] = pool.submit(
+                    self.run_stage, name, func, [futures[dep] for dep in deps]
+                )
+
+        results, failed = {}, {}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                failed[name] = e
+
+        print(f"\n--- Pipeline finished in {time.perf_counter() - start:.2f}s ---")
+        for name in self.stages:
+            if name in self.timings:
+                status = "FAILED" if name in failed else "ok"
+                print(f"  {name:<20} {self.timings[name]:8.2f}s  {status}")
+            else:
+                print(f"  {name:<20} {'-':>8}   skipped")
+        for name, e in failed.items():
+            if name in self.timings:
+                print(f"Stage {name} failed: {e}")
+        return results, failed
+
+
+def to_table(df, name):
+    if df is None:
+        return None
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if HANDOFF == "feather":
+        os.makedirs(HANDOFF_DIR, exist_ok=True)
+        path = os.path.join(HANDOFF_DIR, f"{name}.feather")
+        silver_io.write_feather(table, path)
+        table = silver_io.read_feather(path)
+    return table
+
+
+def to_frame(table):
+    return None if table is None else table.to_pandas()
+
+
+def persist(file_name, record=None):
+    # Background Silver write of a table that is already handed on in memory.
+    # None means the stage wrote Silver itself (streaming/incremental runs,
+    # non-hash merge engines, stage cache hits). record() then stores the
+    # producing stage's cache entry, now that its output is in MinIO.
+    def write(table, *_):
+        if table is not None:
+            silver_io.write_silver(minio_config.get_client(), file_name, table)
+            print(f"Saved {file_name} to Silver bucket.")
+            if record is not None:
+                record()
+
+    return write
+
+
+def record_analysis(module):
+    # Stages fed in memory skip the cache lookup and don't record their own
+    # entry, since their input wasn't in Silver yet. Recorded here once the
+    # merged dataset is persisted; a None result is a failed or cached run.
+    def record(result, merged, *_):
+        if result is not None and merged is not None:
+            client = minio_config.get_client()
+            module.record_outputs(client, module.cache_key(client))
+
+    return record
+
+
+def run_hdfs_sync(*_):
+    if HDFS_SYNC_MODE == "local":
+        import hdfs_sync
+
+        hdfs_sync.sync_silver_to_hdfs()
+        return
+    subprocess.run(
+        [
+            "docker",
+            "run",
+            "--rm",
+            "--network",
+            DOCKER_NETWORK,
+            "-v",
+            f"{SCRIPTS_DIR}:/app",
+            "-w",
+            "/app",
+            "-e",
+            "MINIO_ENDPOINT=minio:9000",
+            "python:3.9-slim",
+            "/bin/bash",
+            "-c",
+            "pip install minio hdfs && python hdfs_sync.py",
+        ],
+        check=True,
+    )
+
+
+def build_pipeline():
+    import bronze
+    import factor_analysis
+    import g_traffic
+    import g_weather
+    import merge_data
+    import monte_carlo
+    import silver
+
+    client = minio_config.get_client()
+    pipeline = Pipeline()
+
+    bronze_deps = []
+    if RUN_GENERATORS:
+        pipeline.add("generate_weather", g_weather.generate_weather_data)
+        pipeline.add("generate_traffic", g_traffic.generate_traffic_data)
+        bronze_deps = ["generate_weather", "generate_traffic"]
+
+    clean_deps = []
+    if RUN_BRONZE:
+        pipeline.add("bronze", lambda *_: bronze.upload_to_bronze(), bronze_deps)
+        clean_deps = ["bronze"]
+
+    pipeline.add(
+        "clean_weather",
+        lambda *_: to_table(silver.clean_weather_data(write=False), "clean_weather"),
+        clean_deps,
+    )
+    pipeline.add(
+        "clean_traffic",
+        lambda *_: to_table(silver.clean_traffic(write=False), "clean_traffic"),
+        clean_deps,
+    )
+    for source_key in ("weather", "traffic"):
+        pipeline.add(
+            f"persist_{source_key}",
+            persist(
+                silver.SOURCES[source_key]["target"],
+                lambda source_key=source_key: silver.record_cleaned(
+                    source_key, silver.cache_key(source_key)
+                ),
+            ),
+            [f"clean_{source_key}"],
+        )
+
+    if HDFS_SYNC_MODE is not None:
+        pipeline.add("hdfs_sync", run_hdfs_sync, ["persist_weather", "persist_traffic"])
+
+    # Only the hash engine merges in memory; the others read Silver
+    merge_deps = ["clean_weather", "clean_traffic"]
+    if merge_data.MERGE_ENGINE != "hash":
+        merge_deps += ["persist_weather", "persist_traffic"]
+    pipeline.add(
+        "merge",
+        lambda weather, traffic, *_: to_table(
+            merge_data.merge_datasets(
+                to_frame(weather), to_frame(traffic), write=False
+            ),
+            "merge",
+        ),
+        merge_deps,
+    )
+    # The merge's cache key covers the cleaned Silver inputs, so its entry is
+    # recorded after those are persisted too
+    pipeline.add(
+        "persist_merged",
+        persist(
+            "merged_analytical_data.parquet",
+            lambda: merge_data.record_merged(client, merge_data.cache_key(client)),
+        ),
+        ["merge", "persist_weather", "persist_traffic"],
+    )
+
+    # Without an in-memory merge result the analytics read Silver, so they
+    # wait for the merge engine's own write
+    pipeline.add(
+        "monte_carlo",
+        lambda merged: monte_carlo.run_monte_carlo(to_frame(merged)),
+        ["merge"],
+    )
+    pipeline.add(
+        "factor_analysis",
+        lambda merged: factor_analysis.run_factor_analysis(to_frame(merged)),
+        ["merge"],
+    )
+    if stage_cache.STAGE_CACHE:
+        pipeline.add(
+            "cache_monte_carlo",
+            record_analysis(monte_carlo),
+            ["monte_carlo", "merge", "persist_merged"],
+        )
+        pipeline.add(
+            "cache_factor_analysis",
+            record_analysis(factor_analysis),
+            ["factor_analysis", "merge", "persist_merged"],
+        )
+    return pipeline
+
+
+if __name__ == "__main__":
+    results, failed = build_pipeline().run()
+    if failed:
+        raise SystemExit(1)
@@ -1,19 +1,504 @@
-from minio import Minio
+import minio_config
 import pandas as pd
 import numpy as np
+import itertools
+import json
+import os
+import tempfile
+import pyarrow as pa
+import pyarrow.parquet as pq
 from io import BytesIO
+import silver_io
+import stage_cache
+import transfer
+from dedup_index import FingerprintIndex
+from dtype_optimizer import optimize_dtypes, compact_schema, print_dtype_report
+from fill_stats import (
+    new_fill_stats,
+    update_fill_stats,
+    fill_values,
+    dumps_fill_stats,
+    loads_fill_stats,
+)
+
+client = minio_config.get_client()
+
+# Streaming mode cleans the Bronze CSVs CHUNK_ROWS rows at a time and uploads
+# every cleaned chunk as one Parquet row group through a multipart upload, so
+# memory is bounded by the chunk size instead of the file size.
+STREAMING = False
+CHUNK_ROWS = 500_000
+UPLOAD_PART_SIZE = 16 * 1024 * 1024
+# Sketches used for the streaming median/mode fills (see fill_stats.py)
+MEDIAN_SKETCH = "kll"
+MODE_SKETCH = "topk"
+# Cache the fill sketches in silver/_fill_stats/, keyed on the Bronze
+# object's ETag, so an unchanged Bronze file skips the statistics pass.
+CACHE_FILL_STATS = True
+# Keep the streaming dedup fingerprints in silver/_dedup/<source>/ across
+# runs. Rows seen in an earlier run are dropped, and each run's new rows are
+# appended as <name>/part-<UTC time>.parquet instead of overwriting <name>.parquet.
+PERSIST_DEDUP_INDEX = False
+# Incremental mode only cleans Bronze objects whose ETag changed since the
+# last run (for a changed object, only rows after that object's max
+# date_time) and appends them as new parts. It implies streaming and the
+# persistent dedup index; the watermarks live in
+# silver/_watermarks/<source>.json.
+INCREMENTAL = False
+
+WEATHER_FILL_COLUMNS = [
+    "temperature_c",
+    "humidity",
+    "rain_mm",
+    "wind_speed_kmh",
+    "visibility_m",
+    "air_pressure_hpa",
+]
+WEATHER_MODE_COLUMNS = ["season", "weather_condition"]
+TRAFFIC_FILL_COLUMNS = [
+    "vehicle_count",
+    "avg_speed_kmh",
+    "accident_count",
+    "visibility_m",
+]
+TRAFFIC_MODE_COLUMNS = ["congestion_level"]
+
+# Fixed output schemas so every streamed row group has the same types
+WEATHER_SCHEMA = pa.schema(
+    [
+        ("weather_id", pa.int64()),
+        ("date_time", pa.timestamp("ns")),
+        ("city", pa.string()),
+        ("season", pa.string()),
+        ("temperature_c", pa.float64()),
+        ("humidity", pa.float64()),
+        ("rain_mm", pa.float64()),
+        ("wind_speed_kmh", pa.float64()),
+        ("visibility_m", pa.float64()),
+        ("weather_condition", pa.string()),
+        ("air_pressure_hpa", pa.float64()),
+    ]
+)
+TRAFFIC_SCHEMA = pa.schema(
+    [
+        ("traffic_id", pa.int64()),
+        ("date_time", pa.timestamp("ns")),
+        ("city", pa.string()),
+        ("area", pa.string()),
+        ("vehicle_count", pa.float64()),
+        ("avg_speed_kmh", pa.float64()),
+        ("accident_count", pa.float64()),
+        ("congestion_level", pa.string()),
+        ("road_condition", pa.string()),
+        ("visibility_m", pa.float64()),
+    ]
+)
+
+
+def drop_invalid_rows(df, id_column):
+    df = df.dropna(subset=[id_column])
+    df[id_column] = df[id_column].astype(int)
+
+    df["date_time"] = pd.to_datetime(df["date_time"], errors="coerce")
+    return df.dropna(subset=["date_time"])
+
+
+def exact_fill_stats(df, median_columns, mode_columns):
+    return {
+        "median": {column: df[column].median() for column in median_columns},
+        "mode": {column: df[column].mode()[0] for column in mode_columns},
+    }
+
+
+def fill_weather(weather_data, stats):
+    for column in WEATHER_FILL_COLUMNS:
+        weather_data[column] = weather_data[column].fillna(stats["median"][column])
+
+    for column in WEATHER_MODE_COLUMNS:
+        weather_data[column] = weather_data[column].fillna(stats["mode"][column])
+
+    weather_data["city"] = weather_data["city"].fillna("London")
+    return weather_data
+
+
+def clip_weather(weather_data):
+    weather_data["temperature_c"] = weather_data["temperature_c"].clip(
+        lower=-20, upper=50
+    )
+    weather_data["humidity"] = weather_data["humidity"].clip(lower=-20, upper=120)
+    weather_data["wind_speed_kmh"] = weather_data["wind_speed_kmh"].clip(upper=150)
+    weather_data["visibility_m"] = weather_data["visibility_m"].clip(upper=10000)
+    weather_data["rain_mm"] = weather_data["rain_mm"].clip(upper=50)
+    return weather_data
+
+
+def fill_and_clip_traffic(traffic_data, stats):
+    for col in TRAFFIC_FILL_COLUMNS:
+        traffic_data[col] = traffic_data[col].fillna(stats["median"][col])
+
+    traffic_data["area"] = traffic_data["area"].fillna("Unknown")
+    traffic_data["congestion_level"] = traffic_data["congestion_level"].fillna(
+        stats["mode"]["congestion_level"]
+    )
+
+    # fix outliers and negative values
+    traffic_data["avg_speed_kmh"] = traffic_data["avg_speed_kmh"].abs()
+
+    # Counts and visibility are whole numbers within the integer types of the
+    # merged schema; median fills can land on .5
+    traffic_data["vehicle_count"] = (
+        traffic_data["vehicle_count"].clip(lower=0, upper=5000).round()
+    )
+
+    traffic_data["accident_count"] = (
+        traffic_data["accident_count"].clip(lower=0, upper=10).round()
+    )
+    traffic_data["visibility_m"] = (
+        traffic_data["visibility_m"].clip(lower=0, upper=10000).round()
+    )
+    return traffic_data
+
+
+def read_bronze_csv(object_name):
+    # Parallel ranged download to a local file, then parsed from disk
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, object_name)
+        transfer.download_file(client, "bronze", object_name, path)
+        return pd.read_csv(path)
+
+
+def read_bronze_chunks(object_name, numeric_columns):
+    # Everything is read as text and coerced explicitly, so a column's type
+    # (and the row hashes used for dedup) can't change from chunk to chunk.
+    # Parquet parts from the generators are read batch by batch through
+    # range requests and brought to the same text/numeric types.
+    if object_name.endswith(".parquet"):
+        parquet_file = pq.ParquetFile(
+            silver_io.RangeReader(client, object_name, "bronze")
+        )
+        for batch in parquet_file.iter_batches(batch_size=CHUNK_ROWS):
+            chunk = batch.to_pandas()
+            for column in chunk.columns:
+                if column in numeric_columns:
+                    chunk[column] = pd.to_numeric(chunk[column], errors="coerce")
+                else:
+                    # Only the values: missing ones stay NaN, as read_csv
+                    # leaves them (astype(str) makes "nan"/"None" on pandas < 3)
+                    values = chunk[column]
+                    chunk[column] = values.astype(str).where(values.notna())
+            yield chunk
+        return
+
+    obj = client.get_object("bronze", object_name)
+    try:
+        for chunk in pd.read_csv(obj, chunksize=CHUNK_ROWS, dtype=str):
+            for column in numeric_columns:
+                chunk[column] = pd.to_numeric(chunk[column], errors="coerce")
+            yield chunk
+    finally:
+        obj.close()
+        obj.release_conn()
+
+
+def fill_stats_cache_name(object_name):
+    etag = client.stat_object("bronze", object_name).etag
+    return f"_fill_stats/{object_name}.{etag}.json"
+
+
+def load_cached_fill_stats(cache_name):
+    try:
+        response = client.get_object("silver", cache_name)
+        text = response.read().decode("utf-8")
+        response.close()
+        response.release_conn()
+        return loads_fill_stats(text)
+    except Exception:
+        return None
+
+
+def save_fill_stats(cache_name, stats):
+    buffer = BytesIO(dumps_fill_stats(stats).encode("utf-8"))
+    client.put_object(
+        "silver",
+        cache_name,
+        buffer,
+        buffer.getbuffer().nbytes,
+        content_type="application/json",
+    )
+
+
+def streaming_fill_stats(
+    object_name, id_column, numeric_columns, median_columns, mode_columns
+):
+    # First pass: apply the same row drops as the cleaning pass and feed the
+    # remaining rows into mergeable median/mode sketches.
+    cache_name = fill_stats_cache_name(object_name) if CACHE_FILL_STATS else None
+    if cache_name is not None:
+        stats = load_cached_fill_stats(cache_name)
+        if stats is not None:
+            print(f"Using cached fill statistics {cache_name}")
+            return stats
+
+    stats = new_fill_stats(median_columns, mode_columns, MEDIAN_SKETCH, MODE_SKETCH)
+    seen_rows = FingerprintIndex()
+
+    for chunk in read_bronze_chunks(object_name, numeric_columns):
+        chunk = seen_rows.drop_seen(chunk)
+        update_fill_stats(stats, drop_invalid_rows(chunk, id_column))
+
+    if cache_name is not None:
+        save_fill_stats(cache_name, stats)
+    return stats
+
+
+# Streaming/incremental configuration per Silver source
+SOURCES = {
+    "weather": {
+        "bronze_prefix": "weather_data",
+        "bronze_object": "weather_data.csv",
+        "target": "weather_cleaned.parquet",
+        "id_column": "weather_id",
+        "schema": WEATHER_SCHEMA,
+        "median_columns": WEATHER_FILL_COLUMNS,
+        "mode_columns": WEATHER_MODE_COLUMNS,
+        "clean_chunk": lambda chunk, stats: clip_weather(fill_weather(chunk, stats)),
+    },
+    "traffic": {
+        "bronze_prefix": "traffic_data",
+        "bronze_object": "traffic_data.csv",
+        "target": "traffic_cleaned.parquet",
+        "id_column": "traffic_id",
+        "schema": TRAFFIC_SCHEMA,
+        "median_columns": TRAFFIC_FILL_COLUMNS,
+        "mode_columns": TRAFFIC_MODE_COLUMNS,
+        "clean_chunk": fill_and_clip_traffic,
+    },
+}
+
+
+def clean_streaming(source_key, object_name=None, append=False, min_date_time=None):
+    # Cleans one Bronze object of a source. Returns the max date_time written
+    # (None if nothing was written).
+    source = SOURCES[source_key]
+    object_name = object_name or source["bronze_object"]
+    schema = source["schema"]
+    id_column = source["id_column"]
+    numeric_columns = [
+        field.name
+        for field in schema
+        if pa.types.is_integer(field.type) or pa.types.is_floating(field.type)
+    ]
+
+    print(f"Pass 1: collecting fill statistics for {object_name}...")
+    stats = fill_values(
+        streaming_fill_stats(
+            object_name,
+            id_column,
+            numeric_columns,
+            source["median_columns"],
+            source["mode_columns"],
+        )
+    )
+    print(f"Fill values: {stats}")
+
+    target_name = source["target"]
+    # Generator parts live under nested keys (weather_data/city=.../part-*.csv);
+    # flattened so the suffix can't add path segments to the part name
+    part_suffix = "-" + os.path.splitext(object_name)[0].replace("/", "_")
+    if append:
+        # One dedup index per source, so overlapping Bronze drops dedupe too
+        seen_rows = FingerprintIndex(client, prefix=f"_dedup/{source_key}")
+    else:
+        seen_rows = FingerprintIndex()
+
+    max_date_time = None
+
+    def cleaned_chunks():
+        nonlocal max_date_time
+        rows = 0
+        for chunk in read_bronze_chunks(object_name, numeric_columns):
+            # Exact-once: duplicates within the file and rows from earlier
+            # runs are dropped by fingerprint before any cleaning work
+            chunk = seen_rows.drop_seen(chunk)
+            chunk = drop_invalid_rows(chunk, id_column)
+            if min_date_time is not None:
+                chunk = chunk[chunk["date_time"] > min_date_time]
+            if chunk.empty:
+                continue
+            chunk = source["clean_chunk"](chunk, stats)
+            chunk_max = chunk["date_time"].max()
+            if max_date_time is None or chunk_max > max_date_time:
+                max_date_time = chunk_max
+            rows += len(chunk)
+            print(f" -> {rows} clean rows written")
+            yield chunk[schema.names]
+
+    print(f"Pass 2: cleaning {object_name} in chunks of {CHUNK_ROWS} rows...")
+    chunks = cleaned_chunks()
+    first_chunk = next(chunks, None)
+    if first_chunk is None:
+        print(f"No new rows in {object_name}; nothing to write.")
+        return None
+    chunks = itertools.chain([first_chunk], chunks)
+
+    if not append:
+        silver_io.remove_dataset(client, target_name)
+
+    if silver_io.SILVER_LAYOUT == "partitioned":
+        # Every chunk lands in its city/year/month partitions as new parts
+        for chunk in chunks:
+            silver_io.write_partitioned(
+                client, target_name, optimize_dtypes(chunk), part_suffix
+            )
+    else:
+        if append:
+            target_name = silver_io.dataset_prefix(target_name) + silver_io.part_name(
+                part_suffix
+            )
+        # Row groups must share one schema, so the compact types are fixed
+        # up front instead of being picked per chunk
+        write_schema = compact_schema(schema)
+        tables = (
+            pa.Table.from_pandas(chunk, schema=write_schema, preserve_index=False)
+            for chunk in chunks
+        )
+        silver_io.stream_parquet(
+            client, target_name, tables, write_schema, part_size=UPLOAD_PART_SIZE
+        )
+
+    seen_rows.commit()
+    print(f"Saved {target_name} to Silver bucket.")
+    return max_date_time
+
+
+def load_watermark(source_key):
+    # {"objects": {object_name: {"etag": ..., "max_date_time": ...}}}
+    try:
+        response = client.get_object("silver", f"_watermarks/{source_key}.json")
+        watermark = json.loads(response.read().decode("utf-8"))
+        response.close()
+        response.release_conn()
+    except Exception:
+        return {"objects": {}}
+    # Older watermarks kept one max_date_time per source and only the ETag
+    # per object; without a per-object time a rewrite is cleaned in full
+    return {
+        "objects": {
+            name: entry if isinstance(entry, dict) else {"etag": entry}
+            for name, entry in watermark["objects"].items()
+        }
+    }
+
+
+def save_watermark(source_key, watermark):
+    buffer = BytesIO(json.dumps(watermark, indent=2).encode("utf-8"))
+    client.put_object(
+        "silver",
+        f"_watermarks/{source_key}.json",
+        buffer,
+        buffer.getbuffer().nbytes,
+        content_type="application/json",
+    )
+
+
+def clean_incremental(source_key):
+    source = SOURCES[source_key]
+    watermark = load_watermark(source_key)
+    print(f"Watermark for {source_key}: {len(watermark['objects'])} objects seen")
+
+    for obj in client.list_objects(
+        "bronze", prefix=source["bronze_prefix"], recursive=True
+    ):
+        object_name = obj.object_name
+        if not object_name.endswith((".csv", ".parquet")):
+            continue
+
+        seen = watermark["objects"].get(object_name, {})
+        if seen.get("etag") == obj.etag:
+            print(f"{object_name} unchanged since last run, skipping.")
+            continue
+
+        # A new object is cleaned in full (the dedup index drops overlap);
+        # a rewritten one only contributes rows past its own max date_time,
+        # so other objects (cities) can't hide its older rows.
+        min_date_time = None
+        if seen.get("max_date_time") is not None:
+            min_date_time = pd.Timestamp(seen["max_date_time"])
+
+        max_date_time = clean_streaming(
+            source_key, object_name, append=True, min_date_time=min_date_time
+        )
+
+        # Saved per object, so a failed run resumes where it stopped
+        if max_date_time is None:
+            max_date_time = min_date_time
+        watermark["objects"][object_name] = {
+            "etag": obj.etag,
+            "max_date_time": (
+                max_date_time.isoformat() if max_date_time is not None else None
+            ),
+        }
+        save_watermark(source_key, watermark)
+
+
+def cache_key(source_key):
+    # Stage cache key for cleaning one source (see stage_cache.py). The clip
+    # bounds and cleaning rules are covered by the code version.
+    return stage_cache.stage_key(
+        client,
+        [("bronze", SOURCES[source_key]["bronze_object"])],
+        {
+            "streaming": STREAMING,
+            "chunk_rows": CHUNK_ROWS,
+            "median_sketch": MEDIAN_SKETCH,
+            "mode_sketch": MODE_SKETCH,
+            "persist_dedup_index": PERSIST_DEDUP_INDEX,
+            "layout": silver_io.SILVER_LAYOUT,
+            "row_group_rows": silver_io.ROW_GROUP_ROWS,
+        },
+        ["silver", "silver_io", "fill_stats", "dedup_index", "dtype_optimizer"],
+    )
 
-client = Minio("localhost:9000", "admin", "admin123", secure=False)
 
+def cached(source_key):
+    # Returns (key, fresh). Incremental runs keep their own watermarks.
+    if INCREMENTAL:
+        return None, False
+    key = cache_key(source_key)
+    fresh = stage_cache.is_fresh(client, f"clean_{source_key}", key)
+    if fresh:
+        print(f"{SOURCES[source_key]['target']} is up to date (stage cache), skipping.")
+    return key, fresh
 
-def clean_weather_data():
+
+def record_cleaned(source_key, key):
+    stage_cache.record(
+        client, f"clean_{source_key}", key, [("silver", SOURCES[source_key]["target"])]
+    )
+
+
+def clean_weather_data(write=True):
+    # Returns the cleaned frame for the in-memory path (None otherwise).
+    # write=False leaves the Silver write to the caller.
+    key, fresh = cached("weather")
+    if fresh:
+        return None
+    if INCREMENTAL or STREAMING:
+        try:
+            if INCREMENTAL:
+                clean_incremental("weather")
+            else:
+                clean_streaming("weather", append=PERSIST_DEDUP_INDEX)
+                record_cleaned("weather", key)
+        except Exception as e:
+            print(f"Error cleaning weather data: {e}")
+        return
 
     try:
-        obj = client.get_object("bronze", "weather_data.csv")
-        weather_data = pd.read_csv(BytesIO(obj.read()))
+        weather_data = read_bronze_csv("weather_data.csv")
     except Exception as e:
         print(f"Error fetching weather data: {e}")
-        return
+        return None
 
     print("Original Weather Data:")
     print(weather_data.head())
@@ -26,36 +511,10 @@ def clean_weather_data():
     weather_data.drop_duplicates(inplace=True)
 
     # fill na and check for data types
-    weather_data = weather_data.dropna(subset=["weather_id"])
-    weather_data["weather_id"] = weather_data["weather_id"].astype(int)
-
-    weather_data["date_time"] = pd.to_datetime(
-        weather_data["date_time"], errors="coerce"
-    )
-    weather_data = weather_data.dropna(subset=["date_time"])
-
-    fill_columns = [
-        "temperature_c",
-        "humidity",
-        "rain_mm",
-        "wind_speed_kmh",
-        "visibility_m",
-        "air_pressure_hpa",
-    ]
-
-    for column in fill_columns:
-        weather_data[column] = weather_data[column].fillna(
-            weather_data[column].median()
-        )
-
-    weather_data["season"] = weather_data["season"].fillna(
-        weather_data["season"].mode()[0]
-    )
-    weather_data["weather_condition"] = weather_data["weather_condition"].fillna(
-        weather_data["weather_condition"].mode()[0]
-    )
+    weather_data = drop_invalid_rows(weather_data, "weather_id")
 
-    weather_data["city"] = weather_data["city"].fillna("London")
+    stats = exact_fill_stats(weather_data, WEATHER_FILL_COLUMNS, WEATHER_MODE_COLUMNS)
+    weather_data = fill_weather(weather_data, stats)
 
     print("check Weather Data:")
     print(weather_data.head())
@@ -65,13 +524,7 @@ def clean_weather_data():
     print(weather_data.describe())
 
     # drop outliers:
-    weather_data["temperature_c"] = weather_data["temperature_c"].clip(
-        lower=-20, upper=50
-    )
-    weather_data["humidity"] = weather_data["humidity"].clip(lower=-20, upper=120)
-    weather_data["wind_speed_kmh"] = weather_data["wind_speed_kmh"].clip(upper=150)
-    weather_data["visibility_m"] = weather_data["visibility_m"].clip(upper=10000)
-    weather_data["rain_mm"] = weather_data["rain_mm"].clip(upper=50)
+    weather_data = clip_weather(weather_data)
 
     print("check Weather Data:")
     print(weather_data.head())
@@ -80,25 +533,35 @@ def clean_weather_data():
 
     print(weather_data.describe())
 
-    parquet_buffer = BytesIO()
-    weather_data.to_parquet(parquet_buffer, index=False)
-    parquet_buffer.seek(0)
-    client.put_object(
-        "silver",
-        "weather_cleaned.parquet",
-        length=parquet_buffer.getbuffer().nbytes,
-        data=parquet_buffer,
-        content_type="application/x-parquet",
-    )
-
+    compact_data = optimize_dtypes(weather_data)
+    print_dtype_report("weather_cleaned.parquet", weather_data, compact_data)
+    if write:
+        silver_io.write_silver(client, "weather_cleaned.parquet", compact_data)
+        record_cleaned("weather", key)
+    return compact_data
+
+
+def clean_traffic(write=True):
+    # Same contract as clean_weather_data
+    key, fresh = cached("traffic")
+    if fresh:
+        return None
+    if INCREMENTAL or STREAMING:
+        try:
+            if INCREMENTAL:
+                clean_incremental("traffic")
+            else:
+                clean_streaming("traffic", append=PERSIST_DEDUP_INDEX)
+                record_cleaned("traffic", key)
+        except Exception as e:
+            print(f"Error cleaning traffic data: {e}")
+        return
 
-def clean_traffic():
     try:
-        obj = client.get_object("bronze", "traffic_data.csv")
-        traffic_data = pd.read_csv(obj)
+        traffic_data = read_bronze_csv("traffic_data.csv")
     except Exception as e:
         print(f"Error reading traffic data: {e}")
-        return
+        return None
     print(" \n============================\n ")
     print(" ====== Original Traffic Data: =======")
     print(" \n============================ \n")
@@ -110,29 +573,10 @@ def clean_traffic():
     traffic_data.drop_duplicates(inplace=True)
 
     # fix nulls and check data types
-    traffic_data = traffic_data.dropna(subset=["traffic_id"])
-    traffic_data["traffic_id"] = traffic_data["traffic_id"].astype(int)
+    traffic_data = drop_invalid_rows(traffic_data, "traffic_id")
 
-    traffic_data["date_time"] = pd.to_datetime(
-        traffic_data["date_time"], errors="coerce"
-    )
-    traffic_data = traffic_data.dropna(subset=["date_time"])
-
-    numeric_cols = ["vehicle_count", "avg_speed_kmh", "accident_count", "visibility_m"]
-    for col in numeric_cols:
-        traffic_data[col] = traffic_data[col].fillna(traffic_data[col].median())
-
-    traffic_data["area"] = traffic_data["area"].fillna("Unknown")
-    traffic_data["congestion_level"] = traffic_data["congestion_level"].fillna(
-        traffic_data["congestion_level"].mode()[0]
-    )
-
-    # fix outliers and negative values
-    traffic_data["avg_speed_kmh"] = traffic_data["avg_speed_kmh"].abs()
-
-    traffic_data["vehicle_count"] = traffic_data["vehicle_count"].clip(upper=5000)
-
-    traffic_data["accident_count"] = traffic_data["accident_count"].clip(upper=10)
+    stats = exact_fill_stats(traffic_data, TRAFFIC_FILL_COLUMNS, TRAFFIC_MODE_COLUMNS)
+    traffic_data = fill_and_clip_traffic(traffic_data, stats)
 
     print("=============================\n ")
     print("check traffic data:")
@@ -141,18 +585,13 @@ def clean_traffic():
     print(traffic_data.describe())
 
     # Save to Silver
-    parquet_buffer = BytesIO()
-    traffic_data.to_parquet(parquet_buffer, index=False)
-    parquet_buffer.seek(0)
-
-    client.put_object(
-        "silver",
-        "traffic_cleaned.parquet",
-        data=parquet_buffer,
-        length=parquet_buffer.getbuffer().nbytes,
-        content_type="application/x-parquet",
-    )
-    print("Saved traffic_cleaned.parquet to Silver bucket.")
+    compact_data = optimize_dtypes(traffic_data)
+    print_dtype_report("traffic_cleaned.parquet", traffic_data, compact_data)
+    if write:
+        silver_io.write_silver(client, "traffic_cleaned.parquet", compact_data)
+        print("Saved traffic_cleaned.parquet to Silver bucket.")
+        record_cleaned("traffic", key)
+    return compact_data
 
 
 def check_objects_in_silver():
@@ -163,6 +602,7 @@ def check_objects_in_silver():
     return objects
 
 
-clean_weather_data()
-clean_traffic()
-print(check_objects_in_silver())
+if __name__ == "__main__":
+    clean_weather_data()
+    clean_traffic()
+    print(check_objects_in_silver())
@@ -0,0 +1,378 @@
+import io
+import os
+import threading
+from datetime import datetime, timezone
+from urllib.parse import quote, unquote
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+import transfer
+
+# Shared reader/writer for Silver datasets. A dataset named "x.parquet" is
+# stored as either:
+#   - "file":        one object x.parquet (plus appended x/part-*.parquet), or
+#   - "partitioned": Hive-style x/city=.../year=.../month=.../part-*.parquet,
+#                    where readers skip partitions outside the requested
+#                    cities/date range without downloading them.
+SILVER_BUCKET = "silver"
+SILVER_LAYOUT = "file"
+# Row group size for Silver writes. Smaller groups let filtered reads skip
+# more data using the per-group min/max statistics.
+ROW_GROUP_ROWS = 100_000
+PARTITION_COLUMNS = ["city", "year", "month"]
+NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+
+def dataset_prefix(name):
+    return name.removesuffix(".parquet") + "/"
+
+
+def part_name(suffix=""):
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+    return f"part-{stamp}{suffix}.parquet"
+
+
+class RangeReader(io.RawIOBase):
+    # Seekable read-only file over one MinIO object. Every read is an HTTP
+    # range request, so pyarrow only downloads the footer, the column chunks
+    # it projects and the row groups whose statistics pass the filters.
+    def __init__(self, client, object_name, bucket=SILVER_BUCKET):
+        # Reads return the response bytes as they are; pyarrow wraps them
+        # without copying (RawIOBase.read would copy them via readinto).
+        self.client = client
+        self.bucket = bucket
+        self.object_name = object_name
+        self.size = client.stat_object(bucket, object_name).size
+        self.position = 0
+        self.bytes_fetched = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        self.position = max(0, offset)
+        return self.position
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.size - self.position
+        length = min(size, self.size - self.position)
+        if length <= 0:
+            return b""
+        response = self.client.get_object(
+            self.bucket, self.object_name, offset=self.position, length=length
+        )
+        data = response.read()
+        response.close()
+        response.release_conn()
+        self.position += len(data)
+        self.bytes_fetched += len(data)
+        return data
+
+    def readall(self):
+        return self.read()
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+
+def read_table(client, object_name, columns=None, filters=None, bucket=SILVER_BUCKET):
+    # One Parquet object as a pyarrow Table, read through range requests
+    return pq.read_table(
+        RangeReader(client, object_name, bucket), columns=columns, filters=filters
+    )
+
+
+class PipeReader:
+    # Read end of an upload pipe. If the writer thread failed, EOF is turned
+    # into that error so put_object aborts instead of storing a truncated file.
+    def __init__(self, read_fd, errors):
+        self.source = os.fdopen(read_fd, "rb")
+        self.errors = errors
+
+    def read(self, size=-1):
+        data = self.source.read(size)
+        if not data and self.errors:
+            raise self.errors[0]
+        return data
+
+    def close(self):
+        self.source.close()
+
+
+def stream_parquet(
+    client,
+    object_name,
+    tables,
+    schema,
+    bucket=SILVER_BUCKET,
+    row_group_size=None,
+    part_size=transfer.PART_SIZE,
+):
+    # The Parquet writer feeds one end of a pipe while put_object reads the
+    # other end in part_size multipart chunks, so the encoded file is never
+    # buffered whole or copied into an intermediate buffer.
+    read_fd, write_fd = os.pipe()
+    errors = []
+
+    def write_row_groups():
+        with os.fdopen(write_fd, "wb") as sink:
+            try:
+                with pq.ParquetWriter(sink, schema) as writer:
+                    for table in tables:
+                        writer.write_table(table, row_group_size=row_group_size)
+            except Exception as e:
+                errors.append(e)
+
+    writer_thread = threading.Thread(target=write_row_groups)
+    writer_thread.start()
+    source = PipeReader(read_fd, errors)
+    try:
+        transfer.upload_stream(
+            client,
+            bucket,
+            object_name,
+            source,
+            part_size=part_size,
+            content_type="application/x-parquet",
+        )
+    finally:
+        # Closing the read end also unblocks the writer if the upload failed
+        source.close()
+        writer_thread.join()
+
+
+def put_parquet(client, object_name, data, bucket=SILVER_BUCKET):
+    # `data` is a DataFrame or a pyarrow Table
+    if not isinstance(data, pa.Table):
+        data = pa.Table.from_pandas(data, preserve_index=False)
+    stream_parquet(
+        client, object_name, [data], data.schema, bucket, row_group_size=ROW_GROUP_ROWS
+    )
+
+
+def write_feather(table, path):
+    # Arrow IPC file for handing a table to another stage on the same host.
+    # Uncompressed, so read_feather can memory-map it.
+    feather.write_feather(table, path, compression="uncompressed")
+
+
+def read_feather(path):
+    # The table's buffers point into the memory-mapped file (page cache), so
+    # nothing is copied or parsed
+    return feather.read_table(path, memory_map=True)
+
+
+def partition_values(object_name):
+    # {"city": "London", "year": "2024", ...} from the key=value path segments
+    values = {}
+    for segment in object_name.split("/")[:-1]:
+        if "=" in segment:
+            key, value = segment.split("=", 1)
+            values[key] = None if value == NULL_PARTITION else unquote(value)
+    return values
+
+
+def list_dataset(client, name):
+    # Parquet objects under the dataset prefix, with their partition values
+    objects = client.list_objects(
+        SILVER_BUCKET, prefix=dataset_prefix(name), recursive=True
+    )
+    return sorted(
+        (obj.object_name, partition_values(obj.object_name))
+        for obj in objects
+        if obj.object_name.endswith(".parquet")
+    )
+
+
+def list_partitions(client, name):
+    # One row per (city, year, month) partition; empty for the file layout
+    partitions = [values for _, values in list_dataset(client, name) if values]
+    if not partitions:
+        return pd.DataFrame(columns=PARTITION_COLUMNS)
+    df = pd.DataFrame(partitions).drop_duplicates()
+    # Rows without a date_time land in a null year/month partition
+    df["year"] = df["year"].astype("Int64")
+    df["month"] = df["month"].astype("Int64")
+    return df.sort_values(PARTITION_COLUMNS).reset_index(drop=True)
+
+
+def keep_partition(values, cities, start, end):
+    # File-layout parts have no partition values; scope_filters then pushes
+    # the whole scope into the file read instead
+    if cities is not None and "city" in values and values["city"] not in cities:
+        return False
+    if values.get("year") is not None and values.get("month") is not None:
+        month = (int(values["year"]), int(values["month"]))
+        if start is not None and month < (start.year, start.month):
+            return False
+        if end is not None and month > (end.year, end.month):
+            return False
+    return True
+
+
+def and_filters(filters, extra):
+    # AND extra (column, op, value) terms into every group of a DNF filter
+    if not extra:
+        return filters
+    if not filters:
+        return extra
+    groups = [filters] if isinstance(filters[0], tuple) else filters
+    return [list(group) + extra for group in groups]
+
+
+def scope_filters(cities, start, end, values):
+    # The row scope as pyarrow terms, so row groups outside it are skipped.
+    # Columns that come from the partition path are not in the file.
+    terms = []
+    if cities is not None and "city" not in values:
+        terms.append(("city", "in", list(cities)))
+    if start is not None:
+        terms.append(("date_time", ">=", start))
+    if end is not None:
+        terms.append(("date_time", "<=", end))
+    return terms
+
+
+def read_silver_table(
+    client, name, cities=None, start=None, end=None, columns=None, filters=None
+):
+    # Reads a Silver dataset in whichever layout it is stored, as a pyarrow
+    # Table. `cities`, `start` and `end` prune partitions first and are then
+    # pushed down into each file read together with `filters` (a pyarrow DNF
+    # filter). Columns from partition paths come back dictionary encoded.
+    start = pd.Timestamp(start) if start is not None else None
+    end = pd.Timestamp(end) if end is not None else None
+    read_columns = columns
+    if columns is not None:
+        # Columns needed for the row filters, minus those that come from paths
+        needed = set(columns) | ({"city"} if cities is not None else set())
+        needed |= {"date_time"} if start is not None or end is not None else set()
+        read_columns = [c for c in needed if c not in ("year", "month")]
+
+    objects = list_dataset(client, name)
+    if not objects:
+        file_filters = and_filters(filters, scope_filters(cities, start, end, {}))
+        table = read_table(client, name, read_columns, file_filters)
+        return table if columns is None else table.select(columns)
+
+    tables = []
+    for object_name, values in objects:
+        if not keep_partition(values, cities, start, end):
+            continue
+        file_columns = (
+            None
+            if read_columns is None
+            else [c for c in read_columns if c not in values]
+        )
+        file_filters = and_filters(filters, scope_filters(cities, start, end, values))
+        table = read_table(client, object_name, file_columns, file_filters)
+        for key, value in values.items():
+            # year/month are derived from date_time; only add on request
+            if key not in ("year", "month"):
+                column = pa.array([value] * len(table), pa.string())
+                table = table.append_column(key, column.dictionary_encode())
+            elif columns is not None and key in columns:
+                value = None if value is None else int(value)
+                table = table.append_column(
+                    key, pa.array([value] * len(table), pa.int32())
+                )
+        tables.append(table)
+    if not tables:
+        return pa.table({column: pa.array([]) for column in columns or []})
+    # Parts written chunk by chunk may have picked different compact types
+    table = pa.concat_tables(tables, promote_options="permissive")
+    return table if columns is None else table.select(columns)
+
+
+def read_silver(
+    client, name, cities=None, start=None, end=None, columns=None, filters=None
+):
+    # read_silver_table as a DataFrame. Dictionary columns become
+    # categoricals, with the dictionaries of all parts unified. The row scope
+    # is already applied by the pyarrow filters; re-filtering here would need
+    # the scope columns, which a projection may have dropped.
+    table = read_silver_table(client, name, cities, start, end, columns, filters)
+    return table.to_pandas()
+
+
+def filter_rows(df, cities=None, start=None, end=None, columns=None):
+    # The row scope of read_silver, for frames that are already in memory
+    if df.empty:
+        return df
+    if cities is not None:
+        df = df[df["city"].isin(cities)]
+    if start is not None:
+        df = df[df["date_time"] >= pd.Timestamp(start)]
+    if end is not None:
+        df = df[df["date_time"] <= pd.Timestamp(end)]
+    if columns is not None:
+        df = df[columns]
+    return df.reset_index(drop=True)
+
+
+def read_silver_schema(client, name):
+    # Schema of the first file (only its footer is fetched), without
+    # partition columns
+    objects = list_dataset(client, name)
+    object_name = objects[0][0] if objects else name
+    return pq.read_schema(RangeReader(client, object_name))
+
+
+def remove_dataset(client, name):
+    # Both the single file and any parts/partitions under the prefix
+    for object_name, _ in list_dataset(client, name):
+        client.remove_object(SILVER_BUCKET, object_name)
+    client.remove_object(SILVER_BUCKET, name)
+
+
+def write_partitioned(client, name, df, suffix=""):
+    df = df.copy()
+    # Nullable, so a missing date_time does not turn 2024 into "2024.0"
+    df["year"] = df["date_time"].dt.year.astype("Int64")
+    df["month"] = df["date_time"].dt.month.astype("Int64")
+    written = []
+    for keys, group in df.groupby(
+        PARTITION_COLUMNS, dropna=False, sort=True, observed=True
+    ):
+        path = "/".join(
+            f"{column}={NULL_PARTITION if pd.isna(value) else quote(str(value), safe='')}"
+            for column, value in zip(PARTITION_COLUMNS, keys)
+        )
+        object_name = f"{dataset_prefix(name)}{path}/{part_name(suffix)}"
+        put_parquet(client, object_name, group.drop(columns=PARTITION_COLUMNS))
+        written.append(object_name)
+    return written
+
+
+def write_silver(client, name, df, append=False, suffix=""):
+    # Full writes replace the dataset; appends add new part files next to it.
+    # `df` may also be a pyarrow Table.
+    if SILVER_LAYOUT == "partitioned":
+        if not append:
+            remove_dataset(client, name)
+        if isinstance(df, pa.Table):
+            df = df.to_pandas()
+        return write_partitioned(client, name, df, suffix)
+
+    if append:
+        object_name = dataset_prefix(name) + part_name(suffix)
+    else:
+        # Appended parts would otherwise shadow the new full file
+        remove_dataset(client, name)
+        object_name = name
+    put_parquet(client, object_name, df)
+    return [object_name]
@@ -0,0 +1,110 @@
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+from io import BytesIO
+import silver_io
+
+# Content-addressed cache for whole pipeline stages. A stage's key hashes the
+# ETags of its input objects, its parameters and the source of the modules
+# it runs. The key and the ETags of the artifacts the stage wrote are kept
+# in silver/_stage_cache/<stage>.json, so every runner sharing the MinIO
+# server sees them. A stage whose key matches, and whose artifacts are still
+# the ones it wrote, is skipped.
+
+STAGE_CACHE = True
+CACHE_BUCKET = "silver"
+CACHE_PREFIX = "_stage_cache"
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def object_etags(client, bucket, name):
+    # ETags of <name> and of the parts under its dataset prefix, so single
+    # files and partitioned/appended datasets are both covered
+    etags = {}
+    try:
+        etags[f"{bucket}/{name}"] = client.stat_object(bucket, name).etag
+    except Exception:
+        pass
+    for obj in client.list_objects(
+        bucket, prefix=silver_io.dataset_prefix(name), recursive=True
+    ):
+        etags[f"{bucket}/{obj.object_name}"] = obj.etag
+    return etags
+
+
+def code_version(modules):
+    # Hash of the scripts/<module>.py sources a stage runs
+    digest = hashlib.sha256()
+    for module in sorted(modules):
+        with open(os.path.join(SCRIPTS_DIR, f"{module}.py"), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def stage_key(client, inputs, params, modules):
+    # inputs: [(bucket, object name)]; params must be JSON-serialisable
+    # (anything else is hashed by its str())
+    etags = {}
+    for bucket, name in inputs:
+        etags.update(object_etags(client, bucket, name))
+    fingerprint = {
+        "inputs": etags,
+        "params": params,
+        "code": code_version(modules),
+    }
+    return hashlib.sha256(
+        json.dumps(fingerprint, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+
+
+def manifest_name(stage):
+    return f"{CACHE_PREFIX}/{stage}.json"
+
+
+def load_manifest(client, stage):
+    try:
+        response = client.get_object(CACHE_BUCKET, manifest_name(stage))
+        manifest = json.loads(response.read().decode("utf-8"))
+        response.close()
+        response.release_conn()
+        return manifest
+    except Exception:
+        return None
+
+
+def is_fresh(client, stage, key):
+    if not STAGE_CACHE:
+        return False
+    manifest = load_manifest(client, stage)
+    if manifest is None or manifest["key"] != key:
+        return False
+    # The artifacts must still be there, unchanged since the stage wrote them
+    etags = {}
+    for bucket, name in manifest["outputs"]:
+        etags.update(object_etags(client, bucket, name))
+    return bool(etags) and etags == manifest["etags"]
+
+
+def record(client, stage, key, outputs):
+    # outputs: [(bucket, object name)] written by the stage under this key
+    if not STAGE_CACHE:
+        return
+    etags = {}
+    for bucket, name in outputs:
+        etags.update(object_etags(client, bucket, name))
+    manifest = {
+        "key": key,
+        "outputs": [list(output) for output in outputs],
+        "etags": etags,
+        "recorded_at": datetime.now(timezone.utc).isoformat(),
+    }
+    buffer = BytesIO(json.dumps(manifest, indent=2).encode("utf-8"))
+    client.put_object(
+        CACHE_BUCKET,
+        manifest_name(stage),
+        buffer,
+        buffer.getbuffer().nbytes,
+        content_type="application/json",
+    )
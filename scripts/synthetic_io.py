@@ -0,0 +1,44 @@
+import os
+import pyarrow as pa
+import pyarrow.csv as csv
+import pyarrow.parquet as pq
+import minio_config
+import transfer
+
+# Output for the synthetic data generators. Every part file goes either to
+# a local directory or straight into the bronze bucket (encoded in memory,
+# no local copy), under the same <dataset>/<partition>/part-<n>.<format> key.
+# Arrow's CSV writer is about 10x faster than DataFrame.to_csv, and both
+# writers produce the same bytes for the same table.
+
+CONTENT_TYPES = {"csv": "text/csv", "parquet": "application/x-parquet"}
+
+
+def write_table(table, sink, output_format):
+    if output_format == "parquet":
+        pq.write_table(table, sink)
+    else:
+        csv.write_csv(table, sink)
+
+
+def write_part(df, object_name, output_format, destination, output_dir):
+    # Returns where the part was written
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if destination == "bronze":
+        sink = pa.BufferOutputStream()
+        write_table(table, sink, output_format)
+        data = sink.getvalue()
+        transfer.upload_stream(
+            minio_config.get_client(),
+            "bronze",
+            object_name,
+            pa.BufferReader(data),
+            data.size,
+            content_type=CONTENT_TYPES[output_format],
+        )
+        return f"bronze/{object_name}"
+
+    path = os.path.join(output_dir, *object_name.split("/"))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    write_table(table, path, output_format)
+    return path
@@ -0,0 +1,113 @@
+from concurrent.futures import ThreadPoolExecutor
+
+# Shared MinIO transfer layer. Uploads are multipart with CONCURRENCY parts
+# in flight; downloads split the object into PART_SIZE ranges fetched in
+# parallel and written straight to their offset in the target file. Data is
+# streamed from/to files, so memory stays around CONCURRENCY * PART_SIZE.
+
+PART_SIZE = 16 * 1024 * 1024  # S3 minimum is 5 MiB
+CONCURRENCY = 8
+# Chunk size for copying a ranged response into the file
+STREAM_CHUNK = 1024 * 1024
+
+
+def upload_file(
+    client,
+    bucket,
+    object_name,
+    path,
+    content_type="application/octet-stream",
+    part_size=PART_SIZE,
+    concurrency=CONCURRENCY,
+):
+    return client.fput_object(
+        bucket,
+        object_name,
+        path,
+        content_type=content_type,
+        part_size=part_size,
+        num_parallel_uploads=concurrency,
+    )
+
+
+def upload_stream(
+    client,
+    bucket,
+    object_name,
+    stream,
+    length=-1,
+    content_type="application/octet-stream",
+    part_size=PART_SIZE,
+    concurrency=CONCURRENCY,
+):
+    # length=-1 for streams of unknown size (pipes); parts are cut as the
+    # data arrives
+    return client.put_object(
+        bucket,
+        object_name,
+        stream,
+        length,
+        content_type=content_type,
+        part_size=part_size,
+        num_parallel_uploads=concurrency,
+    )
+
+
+def upload_files(client, bucket, files, concurrency=CONCURRENCY, **kwargs):
+    # files: {object_name: local path}. Files upload side by side, each one
+    # multipart as well.
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(files)))) as pool:
+        futures = {
+            object_name: pool.submit(
+                upload_file, client, bucket, object_name, path, **kwargs
+            )
+            for object_name, path in files.items()
+        }
+        return {object_name: f.result() for object_name, f in futures.items()}
+
+
+def download_range(client, bucket, object_name, path, offset, length):
+    response = client.get_object(bucket, object_name, offset=offset, length=length)
+    try:
+        # Each range has its own handle, so no seek is shared between threads
+        with open(path, "r+b") as f:
+            f.seek(offset)
+            for data in response.stream(STREAM_CHUNK):
+                f.write(data)
+    finally:
+        response.close()
+        response.release_conn()
+
+
+def download_file(
+    client,
+    bucket,
+    object_name,
+    path,
+    part_size=PART_SIZE,
+    concurrency=CONCURRENCY,
+):
+    size = client.stat_object(bucket, object_name).size
+    # Pre-size the file so every range can be written at its offset
+    with open(path, "wb") as f:
+        f.truncate(size)
+    if size == 0:
+        return path
+
+    ranges = [
+        (offset, min(part_size, size - offset)) for offset in range(0, size, part_size)
+    ]
+    if len(ranges) == 1:
+        download_range(client, bucket, object_name, path, 0, size)
+        return path
+
+    with ThreadPoolExecutor(max_workers=min(concurrency, len(ranges))) as pool:
+        futures = [
+            pool.submit(
+                download_range, client, bucket, object_name, path, offset, length
+            )
+            for offset, length in ranges
+        ]
+        for future in futures:
+            future.result()
+    return path
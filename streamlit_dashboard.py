@@ -1,28 +1,38 @@
 import streamlit as st
 import pandas as pd
 import io
-from minio import Minio
+import os
+import sys
 from PIL import Image
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts"))
+import minio_config
+import silver_io
+
 # --- Configuration ---
 st.set_page_config(page_title="Urban Traffic Analytics", layout="wide")
 
-MINIO_ENDPOINT = "localhost:9000"
-ACCESS_KEY = "admin"
-SECRET_KEY = "admin123"
-
 
 # --- MinIO Connection Helper ---
 @st.cache_resource
 def get_minio_client():
-    return Minio(
-        MINIO_ENDPOINT, access_key=ACCESS_KEY, secret_key=SECRET_KEY, secure=False
-    )
+    # Shared pooled client, configured from the MINIO_* environment variables
+    return minio_config.get_client()
 
 
-def load_data(bucket, filename, file_type="csv"):
+def load_data(bucket, filename, file_type="csv", optional=False):
+    # optional: a missing object returns None without an error message
     client = get_minio_client()
     try:
+        if optional:
+            client.stat_object(bucket, filename)
+    except Exception:
+        return None
+    try:
+        if file_type == "parquet":
+            # Range reads straight into Arrow, no download buffer
+            return silver_io.read_table(client, filename, bucket=bucket).to_pandas()
+
         response = client.get_object(bucket, filename)
         data = response.read()
         response.close()
@@ -30,8 +40,6 @@ def load_data(bucket, filename, file_type="csv"):
 
         if file_type == "csv":
             return pd.read_csv(io.BytesIO(data))
-        elif file_type == "parquet":
-            return pd.read_parquet(io.BytesIO(data))
         elif file_type == "image":
             return Image.open(io.BytesIO(data))
     except Exception as e:
@@ -39,31 +47,60 @@ def load_data(bucket, filename, file_type="csv"):
         return None
 
 
+def load_silver(cities=None, start=None, end=None):
+    # Partitioned Silver data is pruned to the selected cities and months
+    # before anything is downloaded.
+    client = get_minio_client()
+    try:
+        df = silver_io.read_silver(
+            client, "merged_analytical_data.parquet", cities, start, end
+        )
+    except Exception as e:
+        st.error(f"Error loading merged_analytical_data.parquet: {e}")
+        return None
+
+    # Ensure date_time is actually a datetime object (Crucial for filtering)
+    if not df.empty and not pd.api.types.is_datetime64_any_dtype(df["date_time"]):
+        df["date_time"] = pd.to_datetime(df["date_time"])
+    return df
+
+
 # --- Main Dashboard App ---
 def main():
     st.title("🚗 Urban Traffic Analytics Dashboard")
 
-    # 1. LOAD DATA FIRST
-    df = load_data("silver", "merged_analytical_data.parquet", "parquet")
-
-    if df is None:
-        st.error("Failed to load data from Silver Layer. Please check MinIO.")
-        return
-
-    # Ensure date_time is actually a datetime object (Crucial for filtering)
-    if not pd.api.types.is_datetime64_any_dtype(df["date_time"]):
-        df["date_time"] = pd.to_datetime(df["date_time"])
+    # 1. LOAD FILTER OPTIONS FIRST
+    # The partition listing is enough to build the filters; the single-file
+    # layout has to be loaded in full to find them.
+    partitions = silver_io.list_partitions(
+        get_minio_client(), "merged_analytical_data.parquet"
+    )
+    df = None
+    if partitions.empty:
+        df = load_silver()
+        if df is None:
+            st.error("Failed to load data from Silver Layer. Please check MinIO.")
+            return
+        cities = list(df["city"].unique())
+        min_date = df["date_time"].min().date()
+        max_date = df["date_time"].max().date()
+    else:
+        cities = list(partitions["city"].dropna().unique())
+        first, last = partitions.iloc[0], partitions.iloc[-1]
+        min_date = pd.Timestamp(year=first["year"], month=first["month"], day=1).date()
+        max_date = (
+            pd.Timestamp(year=last["year"], month=last["month"], day=1)
+            + pd.offsets.MonthEnd(0)
+        ).date()
 
     # 2. SIDEBAR FILTERS
     st.sidebar.header("Filter Options")
 
     # --- A. City Filter ---
-    city_list = ["All"] + list(df["city"].unique())
+    city_list = ["All"] + cities
     selected_city = st.sidebar.selectbox("Select City", city_list)
 
     # --- B. Date Range Filter ---
-    min_date = df["date_time"].min().date()
-    max_date = df["date_time"].max().date()
 
     st.sidebar.subheader("Select Date Range")
     try:
@@ -78,6 +115,19 @@ def main():
         start_date, end_date = min_date, max_date
 
     # 3. APPLY FILTERS TO DATA
+    if df is None:
+        df = load_silver(
+            None if selected_city == "All" else [selected_city],
+            pd.Timestamp(start_date),
+            pd.Timestamp(end_date) + pd.Timedelta(days=1) - pd.Timedelta(1, "ns"),
+        )
+        if df is None:
+            st.error("Failed to load data from Silver Layer. Please check MinIO.")
+            return
+    if df.empty:
+        df = pd.DataFrame(columns=["city", "date_time", "congestion_level"])
+        df["date_time"] = pd.to_datetime(df["date_time"])
+
     # Filter by City
     if selected_city != "All":
         df = df[df["city"] == selected_city]
@@ -132,20 +182,56 @@ def main():
             "Note: These results are based on the full simulation run (Gold Layer) and are not affected by the sidebar filters."
         )
 
-        # Load Results CSV
-        sim_df = load_data("gold", "simulation_results.csv", "csv")
+        # KPIs come from the run summary (the only CSV a streaming run
+        # writes); Gold from before summaries existed only has the runs
+        summary_df = load_data("gold", "simulation_summary.csv", "csv", optional=True)
+        sim_df = load_data(
+            "gold", "simulation_results.csv", "csv", optional=summary_df is not None
+        )
 
-        if sim_df is not None:
-            # Calculate KPIs dynamically
-            prob_jam = sim_df["is_traffic_jam"].mean() * 100
-            prob_accident = sim_df["is_accident"].mean() * 100
-            avg_risk = sim_df["risk_score"].mean()
+        if summary_df is not None:
+            summary = summary_df.iloc[0]
+        elif sim_df is not None:
+            summary = pd.Series(
+                {
+                    "runs": len(sim_df),
+                    "avg_risk": sim_df["risk_score"].mean(),
+                    "prob_jam": sim_df["is_traffic_jam"].mean() * 100,
+                    "prob_accident": sim_df["is_accident"].mean() * 100,
+                }
+            )
+        else:
+            summary = None
 
-            # Display KPIs
+        if summary is not None:
+            # Display KPIs, with confidence intervals for variance-reduced runs
+            ci = "avg_risk_ci" in summary and pd.notna(summary["avg_risk_ci"])
             kpi1, kpi2, kpi3 = st.columns(3)
-            kpi1.metric("Avg Risk Score (0-10)", f"{avg_risk:.2f}")
-            kpi2.metric("Prob. of Traffic Jam", f"{prob_jam:.2f}%")
-            kpi3.metric("Prob. of Accident", f"{prob_accident:.2f}%")
+            kpi1.metric(
+                "Avg Risk Score (0-10)",
+                f"{summary['avg_risk']:.2f}",
+                f"± {summary['avg_risk_ci']:.3f}" if ci else None,
+                delta_color="off",
+            )
+            kpi2.metric(
+                "Prob. of Traffic Jam",
+                f"{summary['prob_jam']:.2f}%",
+                f"± {summary['prob_jam_ci']:.2f} pp" if ci else None,
+                delta_color="off",
+            )
+            kpi3.metric(
+                "Prob. of Accident",
+                f"{summary['prob_accident']:.2f}%",
+                f"± {summary['prob_accident_ci']:.2f} pp" if ci else None,
+                delta_color="off",
+            )
+            caption = f"{int(summary['runs']):,} simulated runs"
+            if ci:
+                caption += (
+                    f", variance reduction: {summary['variance_reduction']}"
+                    " (± is the confidence interval half-width)"
+                )
+            st.caption(caption)
 
             st.divider()
 
@@ -159,9 +245,10 @@ def main():
                     use_container_width=True,
                 )
 
-            # Raw Simulation Data
-            with st.expander("View Raw Simulation Logs"):
-                st.dataframe(sim_df)
+            # Raw Simulation Data (not written by streaming runs)
+            if sim_df is not None:
+                with st.expander("View Raw Simulation Logs"):
+                    st.dataframe(sim_df)
 
     # --- TAB 3: Factor Analysis Insights ---
     with tab3:
@@ -0,0 +1,121 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "scripts"))
+import merge_data
+from dtype_optimizer import optimize_dtypes
+from merged_schema import MERGED_SCHEMA, to_merged_frame
+
+duckdb = pytest.importorskip("duckdb")
+
+# The DuckDB merge must produce the same rows and columns as the pandas hash
+# join, for both Silver layouts. Inputs mimic cleaned Silver data: compact
+# dtypes, several areas per hour, hours missing on either side, duplicate
+# weather readings (many-to-many) and a null city key.
+
+
+def cleaned_frames(with_null_city):
+    rng = np.random.default_rng(0)
+    hours = pd.date_range("2024-01-28", periods=120, freq="h")
+    weather = pd.DataFrame(
+        {
+            "weather_id": np.arange(5001, 5001 + 2 * len(hours)),
+            "date_time": np.tile(hours, 2),
+            "city": np.repeat(["London", "Paris"], len(hours)),
+            "season": "Winter",
+            "temperature_c": rng.normal(5, 3, 2 * len(hours)),
+            "humidity": rng.integers(20, 100, 2 * len(hours)).astype(float),
+            "rain_mm": rng.exponential(2, 2 * len(hours)),
+            "wind_speed_kmh": rng.uniform(0, 80, 2 * len(hours)),
+            "visibility_m": rng.integers(50, 10000, 2 * len(hours)).astype(float),
+            "weather_condition": rng.choice(["Clear", "Rain", "Fog"], 2 * len(hours)),
+            "air_pressure_hpa": rng.uniform(950, 1050, 2 * len(hours)),
+        }
+    )
+    # A second reading for some hours, and hours without traffic
+    weather = pd.concat([weather, weather.iloc[::17]], ignore_index=True)
+
+    traffic_hours = np.repeat(hours[10:], 3)
+    n = 2 * len(traffic_hours)
+    traffic = pd.DataFrame(
+        {
+            "traffic_id": np.arange(9001, 9001 + n),
+            "date_time": np.tile(traffic_hours, 2),
+            "city": np.repeat(["London", "Paris"], len(traffic_hours)),
+            "area": rng.choice(["Camden", "Chelsea", "Unknown"], n),
+            "vehicle_count": rng.integers(0, 5000, n),
+            "avg_speed_kmh": rng.uniform(3, 120, n),
+            "accident_count": rng.integers(0, 10, n),
+            "congestion_level": rng.choice(["Low", "Medium", "High"], n),
+            "road_condition": rng.choice(["Dry", "Wet"], n),
+            "visibility_m": rng.integers(50, 10000, n),
+        }
+    )
+    if with_null_city:
+        weather.loc[3, "city"] = None
+        traffic.loc[[0, 1], ["city", "date_time"]] = [None, weather.loc[3, "date_time"]]
+    return optimize_dtypes(weather), optimize_dtypes(traffic)
+
+
+def write_file(df, path):
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), path)
+    return f"read_parquet({merge_data.sql_string(path)})"
+
+
+def write_partitioned(df, root):
+    df = df.assign(year=df["date_time"].dt.year, month=df["date_time"].dt.month)
+    pq.write_to_dataset(
+        pa.Table.from_pandas(df, preserve_index=False),
+        root,
+        partition_cols=["city", "year", "month"],
+    )
+    path = merge_data.sql_string(os.path.join(root, "**", "*.parquet"))
+    return f"read_parquet({path}, hive_partitioning = true)"
+
+
+def duckdb_merge(weather_source, traffic_source):
+    # The batch loop of merge_data.merge_duckdb, without the MinIO upload
+    con = duckdb.connect()
+    query = merge_data.duckdb_merge_query(con, weather_source, traffic_source)
+    batches = con.execute(query).fetch_record_batch(50)
+    frames = [to_merged_frame(batch.to_pandas()) for batch in batches]
+    con.close()
+    return pd.concat(frames, ignore_index=True)
+
+
+@pytest.mark.parametrize("layout", ["file", "partitioned"])
+def test_duckdb_merge_matches_hash_merge(tmp_path, layout):
+    weather, traffic = cleaned_frames(with_null_city=layout == "file")
+    if layout == "file":
+        weather_source = write_file(weather, str(tmp_path / "weather.parquet"))
+        traffic_source = write_file(traffic, str(tmp_path / "traffic.parquet"))
+    else:
+        weather_source = write_partitioned(weather, str(tmp_path / "weather"))
+        traffic_source = write_partitioned(traffic, str(tmp_path / "traffic"))
+
+    expected = to_merged_frame(merge_data.hash_merge(weather, traffic))
+    actual = duckdb_merge(weather_source, traffic_source)
+
+    assert len(expected) > len(traffic) // 2
+    assert list(actual.columns) == MERGED_SCHEMA.names
+    assert merge_data.parity_mismatch(actual, expected) is None
+
+
+def test_parity_mismatch_reports_differences():
+    weather, traffic = cleaned_frames(with_null_city=False)
+    expected = to_merged_frame(merge_data.hash_merge(weather, traffic))
+    changed = expected.copy()
+    changed.loc[0, "vehicle_count"] += 1
+    assert merge_data.parity_mismatch(changed, expected) is not None
+    assert merge_data.parity_mismatch(expected.iloc[1:], expected) is not None
+
+
+def test_sql_string_escapes_quotes():
+    value = "p'a''ss; --"
+    con = duckdb.connect()
+    assert con.execute(f"SELECT {merge_data.sql_string(value)}").fetchone()[0] == value
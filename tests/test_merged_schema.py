@@ -0,0 +1,69 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "scripts"))
+import merge_data
+import silver
+from dtype_optimizer import checked_astype, optimize_dtypes
+from merged_schema import MERGED_SCHEMA, to_merged_frame
+
+# Cleaned Silver data must always fit the merged schema, whatever the Bronze
+# nulls and outliers were.
+
+
+def messy_traffic():
+    hours = pd.date_range("2024-01-01", periods=4, freq="h")
+    return pd.DataFrame(
+        {
+            "traffic_id": [9001, 9002, 9003, 9004],
+            "date_time": hours,
+            "city": "London",
+            "area": ["Camden", None, "Camden", "Chelsea"],
+            # The accident_count median fill is 2.5
+            "vehicle_count": [-5.0, 2.0, np.nan, 40000.0],
+            "avg_speed_kmh": [30.0, -12.0, 50.0, 40.0],
+            "accident_count": [np.nan, 2.0, 3.0, np.nan],
+            "congestion_level": ["Low", "High", None, "Low"],
+            "road_condition": ["Dry", "Wet", "Dry", "Dry"],
+            "visibility_m": [np.nan, 4000.0, 10001.0, 40000.0],
+        }
+    )
+
+
+def test_cleaned_traffic_fits_merged_schema():
+    traffic = messy_traffic()
+    stats = silver.exact_fill_stats(
+        traffic, silver.TRAFFIC_FILL_COLUMNS, silver.TRAFFIC_MODE_COLUMNS
+    )
+    traffic = optimize_dtypes(silver.fill_and_clip_traffic(traffic, stats))
+    weather = pd.DataFrame(
+        {
+            "weather_id": [5001, 5002, 5003, 5004],
+            "date_time": traffic["date_time"],
+            "city": "London",
+            "season": "Winter",
+            "temperature_c": 4.0,
+            "humidity": 80.0,
+            "rain_mm": 0.0,
+            "wind_speed_kmh": 10.0,
+            "visibility_m": 9000.0,
+            "weather_condition": "Clear",
+            "air_pressure_hpa": 1013.0,
+        }
+    )
+
+    merged = to_merged_frame(merge_data.hash_merge(weather, traffic))
+
+    assert list(merged.columns) == MERGED_SCHEMA.names
+    assert merged["vehicle_count"].tolist() == [0, 2, 2, 5000]
+    assert merged["accident_count"].tolist() == [2, 2, 3, 2]
+    assert merged["traffic_visibility_m"].tolist() == [10000, 4000, 10000, 10000]
+
+
+def test_checked_astype_rejects_values_that_do_not_fit():
+    for values in ([1.5, 2.0], [np.nan, 2.0], [40000.0, 2.0]):
+        with pytest.raises(ValueError):
+            checked_astype(pd.Series(values, name="x"), np.dtype("int16"))
@@ -0,0 +1,106 @@
+import io
+import os
+import sys
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "scripts"))
+import silver_io
+
+# Scoped reads of Silver datasets in both layouts, against an in-memory
+# stand-in for the MinIO client.
+
+
+class StoredObject:
+    def __init__(self, object_name, data):
+        self.object_name = object_name
+        self.size = len(data)
+
+
+class Response(io.BytesIO):
+    def release_conn(self):
+        pass
+
+
+class MemoryClient:
+    def __init__(self):
+        self.objects = {}
+
+    def put_object(self, bucket, object_name, data, length, **kwargs):
+        self.objects[bucket, object_name] = (
+            data.read() if length < 0 else data.read(length)
+        )
+
+    def get_object(self, bucket, object_name, offset=0, length=0):
+        data = self.objects[bucket, object_name]
+        return Response(data[offset : offset + length] if length else data[offset:])
+
+    def stat_object(self, bucket, object_name):
+        return StoredObject(object_name, self.objects[bucket, object_name])
+
+    def remove_object(self, bucket, object_name):
+        self.objects.pop((bucket, object_name), None)
+
+    def list_objects(self, bucket, prefix="", recursive=False):
+        for (stored_bucket, object_name), data in sorted(self.objects.items()):
+            if stored_bucket == bucket and object_name.startswith(prefix):
+                yield StoredObject(object_name, data)
+
+
+def rows(cities, start):
+    hours = pd.date_range(start, periods=48, freq="h")
+    return pd.DataFrame(
+        {
+            "weather_id": range(len(cities) * len(hours)),
+            "date_time": list(hours) * len(cities),
+            "city": [city for city in cities for _ in hours],
+            "rain_mm": 1.5,
+        }
+    )
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(silver_io, "SILVER_LAYOUT", "file")
+    return MemoryClient()
+
+
+def test_city_scope_on_appended_file_layout(client):
+    # Incremental runs append <name>/part-*.parquet without partition paths
+    silver_io.write_silver(
+        client, "w.parquet", rows(["London", "Paris"], "2024-01-01"), append=True
+    )
+    silver_io.write_silver(
+        client, "w.parquet", rows(["London"], "2024-02-01"), append=True
+    )
+
+    df = silver_io.read_silver(client, "w.parquet", cities=["London"])
+    assert len(df) == 96
+    assert set(df["city"]) == {"London"}
+
+    df = silver_io.read_silver(
+        client,
+        "w.parquet",
+        cities=["Paris"],
+        end="2024-01-01 11:00",
+        columns=["rain_mm"],
+    )
+    assert len(df) == 12
+    assert list(df.columns) == ["rain_mm"]
+
+
+def test_null_date_partition(client, monkeypatch):
+    monkeypatch.setattr(silver_io, "SILVER_LAYOUT", "partitioned")
+    df = rows(["London"], "2024-01-31")
+    df.loc[0, "date_time"] = pd.NaT
+    silver_io.write_silver(client, "w.parquet", df)
+
+    partitions = silver_io.list_partitions(client, "w.parquet")
+    assert len(partitions) == 3
+    assert partitions["year"].isna().sum() == 1
+
+    scoped = silver_io.read_silver(client, "w.parquet", start="2024-02-01")
+    assert len(scoped) == 24
+    everything = silver_io.read_silver(client, "w.parquet", columns=["year", "rain_mm"])
+    assert len(everything) == 48
+    assert everything["year"].isna().sum() == 1